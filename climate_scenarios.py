@@ -0,0 +1,145 @@
+#!/bin/env python
+"""
+Program: Climate Scenarios
+Programmer: Steven Doyle
+Date: 05.18.2021
+
+This script evaluates what-if climate scenarios against the plant list without copying 'env_var.csv' for each one.
+A scenario shifts the minimum and maximum temperature by a number of degrees and scales the rainfall and growing
+period by a fraction. All scenarios are evaluated together: each distinct shift of a variable is compared with the
+plant boundaries once and shared by every scenario that uses it, and the factors no scenario changes (altitude, pH,
+texture, fertility) are compared once. For each scenario and state it reports the number of plants that can be
+grown and the number gained and lost compared with the current climate.
+
+inputs: 'ecocrop_cleaned.csv', 'env_var.csv'
+outputs: 'scenario_changes.csv'
+
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from cultivation_function import factor_scores, max_score, min_score, range_score, state_classes
+
+
+# Perturbation columns of a scenario: degrees added to both temperatures, fractional change of rainfall and cycle
+PERTURBATIONS = ['Temp', 'Rain', 'Cycle']
+
+# State columns the perturbations change
+PERTURBED_COLS = ['Temp_Min', 'Temp_Max', 'Rain', 'Cycle']
+
+
+def scenario_grid(temps=(0,), rains=(0,), cycles=(0,)):
+    '''
+    This function returns a scenario dataframe with one row for every combination of the given perturbations.
+    '''
+
+    grid = pd.DataFrame(list(itertools.product(temps, rains, cycles)), columns=PERTURBATIONS)
+    grid.index.name = 'Scenario'
+
+    return grid
+
+
+def _passes(values, score):
+    '''
+    This function compares the state values of every distinct perturbation with the plant boundaries and returns
+    a (perturbations x states x crops) boolean array of plants that are not excluded. The score function is given
+    each perturbed state column and the unperturbed plant columns.
+    '''
+
+    return np.stack([score(v) != 0 for v in values])
+
+
+def _in_order(resdf, scenarios):
+    '''
+    This function sorts a result table by scenario, in the order of the scenario table, and then by the row of the
+    state in the state table, given by its 'Row' column.
+    '''
+
+    order = np.lexsort((resdf['Row'].to_numpy(), scenarios.index.get_indexer(resdf['Scenario'])))
+
+    return resdf.iloc[order].reset_index(drop=True)
+
+
+def scenario_changes(plants, states, scenarios, chunk_size=256, dedupe=False, tolerance=None):
+    '''
+    This function evaluates every scenario against every state and returns a table with the number of plants that
+    can be grown in each state under each scenario ('Suitable'), under the current climate ('Baseline'), and the
+    number gained and lost, ordered by scenario and then by state. With dedupe, only the first state of each class
+    from state_classes() is evaluated and its counts are copied to the rest of the class, which gives the same table.
+    The perturbed columns are compared by value, so states only share a class if they stay equivalent under every
+    scenario.
+    '''
+
+    if dedupe:
+        first, inverse = state_classes(plants, states, tolerance, raw=PERTURBED_COLS)
+        reps = states.iloc[first]
+        members = pd.DataFrame({'Class': reps['State_Code'].to_numpy()[inverse],
+                                'State_Code': states['State_Code'].to_numpy(), 'Row': np.arange(len(states))})
+        resdf = scenario_changes(plants, reps, scenarios, chunk_size)
+        cols = list(resdf.columns)
+        resdf = resdf.rename(columns={'State_Code': 'Class'}).merge(members, on='Class')
+        return _in_order(resdf, scenarios)[cols]
+
+    def req(col):  # Plant column as a (crops) float array
+        return plants[col].to_numpy(dtype=float)
+
+    # Distinct values of each perturbation and the position of each scenario's value among them
+    uniques, which = {}, {}
+    for col in PERTURBATIONS:
+        uniques[col], which[col] = np.unique(scenarios[col].to_numpy(dtype=float), return_inverse=True)
+
+    tables = []
+    for start in range(0, len(states), chunk_size):
+        chunk = states.iloc[start:start + chunk_size]
+        scores = factor_scores(plants, chunk)
+        baseline = scores['Growth'] > 0
+        fixed = (scores['Alt'] != 0) & (scores['pH'] != 0) & (scores['Texture'] != 0) & (scores['Fertility'] != 0)
+
+        def env(col):  # State column as a (states x 1) float array
+            return chunk[col].to_numpy(dtype=float)[:, None]
+
+        # Compare each distinct perturbation once, reusing the baseline comparison where it is 0
+        tmin = _passes(uniques['Temp'], lambda d: scores['Temp_Min'] if d == 0 else
+                       min_score(env('Temp_Min') + d, req('Temp_Abs_Min'), req('Temp_Opt_Min')))
+        tmax = _passes(uniques['Temp'], lambda d: scores['Temp_Max'] if d == 0 else
+                       max_score(env('Temp_Max') + d, req('Temp_Abs_Max'), req('Temp_Opt_Max')))
+        rain = _passes(uniques['Rain'], lambda d: scores['Rain'] if d == 0 else
+                       range_score(env('Rain')*(1 + d), req('Rain_Abs_Min'), req('Rain_Abs_Max'),
+                                   req('Rain_Opt_Min'), req('Rain_Opt_Max')))
+        cycle = _passes(uniques['Cycle'], lambda d: scores['Cycle'] if d == 0 else
+                        (env('Cycle')*(1 + d) >= req('Cycle_Min')) & (env('Cycle')*(1 + d) <= req('Cycle_Max')))
+
+        # Combine the shared comparisons for all scenarios at once
+        suitable = (fixed & tmin[which['Temp']] & tmax[which['Temp']] & rain[which['Rain']] &
+                    cycle[which['Cycle']])
+
+        n_scen, n_states = len(scenarios), len(chunk)
+        table = pd.DataFrame({'Scenario': np.repeat(scenarios.index.to_numpy(), n_states),
+                              'State_Code': np.tile(chunk['State_Code'].to_numpy(), n_scen),
+                              'Row': np.tile(np.arange(start, start + n_states), n_scen),
+                              'Baseline': np.tile(baseline.sum(axis=1), n_scen),
+                              'Suitable': suitable.sum(axis=2).ravel(),
+                              'Gained': (suitable & ~baseline).sum(axis=2).ravel(),
+                              'Lost': (~suitable & baseline).sum(axis=2).ravel()})
+        tables.append(table)
+
+    resdf = pd.concat(tables, ignore_index=True)
+    resdf = _in_order(resdf.merge(scenarios, left_on='Scenario', right_index=True), scenarios)
+
+    return resdf[['Scenario'] + PERTURBATIONS + ['State_Code', 'Baseline', 'Suitable', 'Gained', 'Lost']]
+
+
+
+if __name__ == '__main__':
+
+    # Initialize dataframes
+    plants = pd.read_csv('ecocrop_files/ecocrop_cleaned.csv', header=0)
+    states = pd.read_csv('processed_env_files/env_var.csv', header=0)
+
+    # Warming of 0 to 3 degrees combined with rainfall changes of -20% to +20%
+    scenarios = scenario_grid(temps=[0, 1, 2, 3], rains=[-0.2, -0.1, 0, 0.1, 0.2])
+    resdf = scenario_changes(plants, states, scenarios)
+    resdf.to_csv('scenario_changes.csv', header=True, index=False)
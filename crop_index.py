@@ -0,0 +1,132 @@
+#!/bin/env python
+"""
+Program: Crop Interval Index
+Programmer: Steven Doyle
+Date: 05.13.2021
+
+This script builds an index over the absolute boundary values of the ECOCrop plant list so that the plants which can
+be grown at a single location can be found without scoring the whole list. Each absolute boundary column is kept
+sorted, so the plants that pass one side of a range check are a slice of the sorted order. A query starts from the
+most selective check and only compares the remaining candidates against the other checks, then scores the plants
+that pass with the cultivation function.
+
+inputs: 'ecocrop_cleaned.csv', 'env_var.csv'
+outputs: none, prints the plants that can be grown in the chosen state
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from cultivation_function import (FERTILITY_LEVELS, MISSING_FAILS, RESULT_COLS, TEXTURE_BITS, cultivation_batch,
+                                  plant_codes)
+
+
+# Absolute checks of the cultivation function as (plant column, state column, side). A 'min' column passes when it
+# is at most the state value and a 'max' column passes when it is at least the state value.
+BOUNDS = [('Alt_Abs_Max', 'Alt', 'max'),
+          ('Rain_Abs_Min', 'Rain', 'min'),
+          ('Rain_Abs_Max', 'Rain', 'max'),
+          ('pH_Abs_Min', 'pH', 'min'),
+          ('pH_Abs_Max', 'pH', 'max'),
+          ('Temp_Abs_Min', 'Temp_Min', 'min'),
+          ('Temp_Abs_Max', 'Temp_Max', 'max'),
+          ('Cycle_Min', 'Cycle', 'min'),
+          ('Cycle_Max', 'Cycle', 'max')]
+
+
+class CropIntervalIndex:
+    '''
+    This class holds the sorted boundary columns of the plant dataframe and the plants allowed by each texture and
+    fertility class. Missing boundary values never fail a check in the cultivation function, so they are stored as
+    open ends.
+    '''
+
+    def __init__(self, plants):
+        self.plants = plants
+
+        self.values = {}  # Boundary column values in plant order
+        self.order = {}  # Plant positions sorted by boundary value
+        self.sorted = {}  # Boundary values in sorted order
+        for col, _, side in BOUNDS:
+            vals = plants[col].to_numpy(dtype=float)
+            vals = np.where(np.isnan(vals), -np.inf if side == 'min' else np.inf, vals)
+            self.values[col] = vals
+            self.order[col] = np.argsort(vals, kind='stable')
+            self.sorted[col] = vals[self.order[col]]
+
+        # Plants that can be grown for each texture and fertility class
+        text_abs, _, fert_abs, _ = plant_codes(plants)
+        self.texture = {texture: np.flatnonzero(text_abs & bit) for texture, bit in TEXTURE_BITS.items()}
+        self.fertility = {f: np.flatnonzero(fert_abs <= level) for f, level in FERTILITY_LEVELS.items()}
+
+    def _candidates(self, col, side, value):
+        '''
+        This function returns the plant positions passing one side of a range check as a slice of the sorted order.
+        '''
+
+        if side == 'min':
+            return self.order[col][:np.searchsorted(self.sorted[col], value, side='right')]
+        return self.order[col][np.searchsorted(self.sorted[col], value, side='left'):]
+
+    def query(self, staterow):
+        '''
+        This function takes a state row (or any mapping with the env_var.csv columns) and returns the sorted
+        positions of the plants inside every absolute boundary, which are the plants with a growth score above 0.
+        A missing state value is handled like the cultivation function: its checks are skipped, or nothing passes
+        if it is a column of MISSING_FAILS.
+        '''
+
+        # Candidate sets for every check, found by binary search or lookup
+        checks = []
+        for col, var, side in BOUNDS:
+            if np.isnan(float(staterow[var])):
+                if var in MISSING_FAILS:
+                    return np.array([], dtype=int)
+                continue
+            checks.append((self._candidates(col, side, float(staterow[var])), col, var, side))
+        checks.append((self.texture.get(staterow['Texture'], np.array([], dtype=int)), 'Texture', None, None))
+        checks.append((self.fertility[staterow['Fertility']], 'Fertility', None, None))
+        checks.sort(key=lambda check: len(check[0]))
+
+        # Start from the most selective check and filter its candidates through the others
+        ids = np.sort(checks[0][0])
+        for cands, col, var, side in checks[1:]:
+            if len(ids) == 0:
+                break
+            if col == 'Texture' or col == 'Fertility':
+                ids = ids[np.isin(ids, cands, assume_unique=True)]
+            elif side == 'min':
+                ids = ids[self.values[col][ids] <= float(staterow[var])]
+            else:
+                ids = ids[self.values[col][ids] >= float(staterow[var])]
+
+        return ids
+
+    def suitable(self, staterow):
+        '''
+        This function returns the score table of the plants that can be grown in the given state, scoring only the
+        plants returned by query().
+        '''
+
+        ids = self.query(staterow)
+        staterow = pd.Series(staterow)
+        for col in RESULT_COLS[:5]:  # Locations that are not in env_var.csv have no names
+            if col not in staterow:
+                staterow[col] = ''
+
+        return cultivation_batch(self.plants.iloc[ids], staterow)
+
+
+
+if __name__ == '__main__':
+
+    # Initialize dataframes
+    plants = pd.read_csv('ecocrop_files/ecocrop_cleaned.csv', header=0)
+    states = pd.read_csv('processed_env_files/env_var.csv', header=0)
+    states = states.set_index('State_Code', drop=False)
+
+    # Find the plants that can be grown in the chosen state
+    index = CropIntervalIndex(plants)
+    resdf = index.suitable(states.loc['TZA.14_1'])
+    print(resdf[['Species', 'Growth']].to_string(index=False))
@@ -0,0 +1,101 @@
+#!/bin/env python
+"""
+Program: Crop Ranking
+Programmer: Steven Doyle
+Date: 05.15.2021
+
+This script ranks the plants that can be grown in a state by their continuous suitability score, so that plants with
+the same growth score can be told apart. Only the best k plants are selected with a partial sort, which keeps
+ranking fast when it is run for every state.
+
+inputs: 'ecocrop_cleaned.csv', 'env_var.csv'
+outputs: '*_*_*_top_crops.csv'
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from cultivation_function import continuous_scores, factor_scores
+
+
+def top_k_indices(values, k):
+    '''
+    This function returns the column positions of the k largest values in each row of a 2d array, best first.
+    It uses argpartition so only the k selected values are sorted. Ties are broken by position.
+    '''
+
+    k = min(k, values.shape[1])
+    part = np.argpartition(-values, k - 1, axis=1)[:, :k]  # Unordered top k of each row
+    top = np.take_along_axis(values, part, axis=1)
+    order = np.lexsort((part, -top), axis=1)  # Sort the k by score, then by position
+
+    return np.take_along_axis(part, order, axis=1)
+
+
+class CropRanker:
+    '''
+    This class holds the plant and state dataframes and ranks the plants of one state or of every state.
+    '''
+
+    def __init__(self, plants, states):
+        self.plants = plants.reset_index(drop=True)
+        self.states = states.reset_index(drop=True)
+        self.state_index = {code: i for i, code in enumerate(self.states['State_Code'])}
+
+    def _ranking(self, codes, top, score, growth):
+        '''
+        This function builds the ranking table of a chunk of states from the selected plant positions of each state,
+        leaving out plants that cannot be grown.
+        '''
+
+        rows = np.arange(len(top))[:, None]
+        resdf = pd.DataFrame({'State_Code': np.repeat(codes, top.shape[1]),
+                              'Rank': np.tile(np.arange(1, top.shape[1] + 1), len(top)),
+                              'Species': self.plants['Species'].to_numpy()[top].ravel(),
+                              'Growth': growth[rows, top].ravel(),
+                              'Score': score[rows, top].ravel()})
+
+        return resdf[resdf['Score'] > 0].reset_index(drop=True)
+
+    def top_k(self, state_code, k=10):
+        '''
+        This function returns the k plants with the highest continuous score in the given state.
+        '''
+
+        states = self.states.iloc[[self.state_index[state_code]]]
+        scores = factor_scores(self.plants, states)
+        score = continuous_scores(self.plants, states, scores)
+
+        return self._ranking(states['State_Code'].to_numpy(), top_k_indices(score, k), score, scores['Growth'])
+
+    def top_k_all(self, k=10, chunk_size=256):
+        '''
+        This function returns the k best plants of every state as one table, scoring the states in chunks.
+        '''
+
+        tables = []
+        for start in range(0, len(self.states), chunk_size):
+            states = self.states.iloc[start:start + chunk_size]
+            scores = factor_scores(self.plants, states)
+            score = continuous_scores(self.plants, states, scores)
+            tables.append(self._ranking(states['State_Code'].to_numpy(), top_k_indices(score, k), score,
+                                        scores['Growth']))
+
+        return pd.concat(tables, ignore_index=True)
+
+
+
+if __name__ == '__main__':
+
+    # Initialize dataframes
+    plants = pd.read_csv('ecocrop_files/ecocrop_cleaned.csv', header=0)
+    states = pd.read_csv('processed_env_files/env_var.csv', header=0)
+    states = states.set_index('State_Code', drop=False)
+
+    # Rank the plants of the chosen state
+    staterow = states.loc['TZA.14_1']
+    ranker = CropRanker(plants, states)
+    resdf = ranker.top_k('TZA.14_1', k=25)
+    resdf.to_csv('{}_{}_{}_top_crops.csv'.format(staterow['State_Name'], staterow['State_Type'],
+                                                 staterow['Country_Name']), header=True, index=False)
@@ -0,0 +1,223 @@
+#!/bin/env python
+"""
+Program: Crop Tables
+Programmer: Steven Doyle
+Date: 05.26.2021
+
+This script holds the plant list and the state list in the compact form the scoring functions need. Each table only
+keeps the columns used for scoring, each stored as one contiguous array: the boundary and environmental values as
+float32 where that keeps them exact and float64 otherwise, the texture flags and fertility ordinals as int8, and the
+species or state codes and names as utf-8 bytes, with an index from species name or state code to row. A table is saved as
+a single snapshot file next to its csv and read back from it whenever the snapshot is newer than the csv, which does
+not need pandas.
+
+inputs: 'ecocrop_cleaned.csv', 'env_var.csv'
+outputs: 'ecocrop_cleaned.table.npy', 'env_var.table.npy'
+
+"""
+
+import os
+import tempfile
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from cultivation_function import RESULT_COLS, plant_codes, state_codes
+
+
+# Extension of the snapshot file saved next to each csv
+SNAPSHOT_EXT = '.table.npy'
+
+
+def _narrow(values):
+    '''
+    This function returns a numeric column as float32 with the number of decimals that restores it exactly, or
+    as float64 with no decimals (-1) when float32 cannot hold it exactly.
+    '''
+
+    values = np.asarray(values, dtype=float)
+    narrow = values.astype(np.float32)
+    for decimals in range(7):
+        if (np.array_equal(np.round(values, decimals), values, equal_nan=True) and
+                np.array_equal(np.round(narrow.astype(float), decimals), values, equal_nan=True)):
+            return narrow, decimals
+
+    return values, -1
+
+
+class ColumnTable(ABC):
+    '''
+    This class is a table stored as one array per column. Indexing it with a column name returns the column as an
+    array, with float32 columns widened back to their exact float64 values and text columns decoded, and indexing it
+    with a slice or an array of rows returns a new table with those rows. Subclasses list the text, numeric, and code
+    columns they keep and the column used for the row index, and give the function that encodes the code columns.
+    '''
+
+    KEY = None
+    TEXT_COLS = []
+    NUMERIC_COLS = []
+    CODE_COLS = []
+
+    def __init__(self, columns, decimals):
+        self.columns = columns
+        self.decimals = decimals
+        self._index = None
+
+    @classmethod
+    @abstractmethod
+    def _codes(cls, df):
+        '''
+        This function returns the int8 code columns of a dataframe, in the order of CODE_COLS.
+        '''
+
+    @classmethod
+    def from_frame(cls, df):
+        '''
+        This function builds the table from a dataframe with the csv columns.
+        '''
+
+        columns, decimals = {}, {}
+        for col in cls.TEXT_COLS:
+            columns[col] = np.char.encode(df[col].to_numpy(dtype=str), 'utf-8')
+        for col in cls.NUMERIC_COLS:
+            columns[col], decimals[col] = _narrow(df[col])
+        for col, codes in zip(cls.CODE_COLS, cls._codes(df)):
+            columns[col] = codes
+
+        return cls(columns, decimals)
+
+    def __len__(self):
+        return len(self.columns[self.KEY])
+
+    def __contains__(self, col):
+        return col in self.columns
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            values = self.columns[key]
+            if values.dtype == np.float32:
+                return np.round(values.astype(float), self.decimals[key])
+            if values.dtype.kind == 'S':
+                return np.char.decode(values, 'utf-8')
+            return values
+
+        return type(self)({col: values[key] for col, values in self.columns.items()}, self.decimals)
+
+    @property
+    def index(self):
+        '''
+        This function returns a dictionary from the key column to row position, built on first use.
+        '''
+
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(self[self.KEY])}
+
+        return self._index
+
+    def row(self, name):
+        '''
+        This function returns the one row table of a species name or state code.
+        '''
+
+        pos = self.index[name]
+
+        return self[pos:pos + 1]
+
+    def to_frame(self):
+        '''
+        This function returns the table as a dataframe.
+        '''
+
+        import pandas as pd
+
+        return pd.DataFrame({col: self[col] for col in self.columns})
+
+    def save(self, path):
+        '''
+        This function saves the table as a single snapshot file: the decimals of the numeric columns followed by
+        every column in the order of TEXT_COLS, NUMERIC_COLS, and CODE_COLS, each as a raw npy block. The file is
+        written under a temporary name in the same folder and then swapped in, so a reader never sees a partly
+        written snapshot.
+        '''
+
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path) or '.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.array([self.decimals[col] for col in self.NUMERIC_COLS], dtype=np.int8))
+                for col in self.TEXT_COLS + self.NUMERIC_COLS + self.CODE_COLS:
+                    np.save(f, self.columns[col])
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        '''
+        This function reads a table saved by save().
+        '''
+
+        with open(path, 'rb') as f:
+            decimals = dict(zip(cls.NUMERIC_COLS, np.load(f).tolist()))
+            columns = {col: np.load(f) for col in cls.TEXT_COLS + cls.NUMERIC_COLS + cls.CODE_COLS}
+
+        return cls(columns, decimals)
+
+    @classmethod
+    def read(cls, path):
+        '''
+        This function reads the table of a csv file from its snapshot if the snapshot is newer than the csv, and
+        otherwise reads the csv and saves the snapshot.
+        '''
+
+        snapshot = os.path.splitext(path)[0] + SNAPSHOT_EXT
+        if os.path.exists(snapshot) and os.path.getmtime(snapshot) >= os.path.getmtime(path):
+            return cls.load(snapshot)
+
+        import pandas as pd  # Only needed to parse the csv
+
+        table = cls.from_frame(pd.read_csv(path, header=0))
+        table.save(snapshot)
+
+        return table
+
+
+class CropTable(ColumnTable):
+    '''
+    This class holds the plant columns used for scoring, indexed by species name.
+    '''
+
+    KEY = 'Species'
+    TEXT_COLS = ['Species']
+    NUMERIC_COLS = ['Temp_Opt_Min', 'Temp_Opt_Max', 'Temp_Abs_Min', 'Temp_Abs_Max', 'Rain_Opt_Min', 'Rain_Opt_Max',
+                    'Rain_Abs_Min', 'Rain_Abs_Max', 'Alt_Abs_Max', 'pH_Opt_Min', 'pH_Opt_Max', 'pH_Abs_Min',
+                    'pH_Abs_Max', 'Cycle_Min', 'Cycle_Max']
+    CODE_COLS = ['Texture_Abs_Flags', 'Texture_Opt_Flags', 'Fertility_Abs_Level', 'Fertility_Opt_Level']
+
+    @classmethod
+    def _codes(cls, df):
+        return plant_codes(df)
+
+
+class StateTable(ColumnTable):
+    '''
+    This class holds the state columns used for scoring, indexed by state code.
+    '''
+
+    KEY = 'State_Code'
+    TEXT_COLS = RESULT_COLS[:5]
+    NUMERIC_COLS = ['Alt', 'Rain', 'pH', 'Temp_Min', 'Temp_Max', 'Cycle']
+    CODE_COLS = ['Texture_Flags', 'Fertility_Level']
+
+    @classmethod
+    def _codes(cls, df):
+        return state_codes(df)
+
+
+
+if __name__ == '__main__':
+
+    # Refresh the snapshots of both tables
+    for cls, path in [(CropTable, 'ecocrop_files/ecocrop_cleaned.csv'), (StateTable, 'processed_env_files/env_var.csv')]:
+        table = cls.read(path)
+        print('{}: {} rows'.format(cls.__name__, len(table)))
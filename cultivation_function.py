@@ -5,14 +5,51 @@ Programmer: Steven Doyle
 Date: 04.29.2021
 
 This script displays the function used to determine whether or not a plant can be grown in a given environment and
-the factors relating to its success.
+the factors relating to its success. Run as a script, it scores the states given by code, the states of the countries
+given with '--country', or every state with '--all' (the Morogoro Region of Tanzania by default), and writes one score
+file per state. The tables are loaded once from their snapshots and the states are spread over worker processes.
+pandas is only imported when a dataframe is needed, so scoring a single state starts quickly.
 
 inputs: 'ecocrop_cleaned.csv', 'env_var.csv'
 outputs: '*_*_*_scores.csv'
 
 """
 
-import pandas as pd
+import argparse
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+
+# Factor columns of the score table, in the order cultivation() returns them
+FACTORS = ['Alt', 'Rain', 'pH', 'Temp_Min', 'Temp_Max', 'Texture', 'Fertility', 'Cycle']
+
+# Layers of the suitability matrix: the factor scores followed by the growth score
+SCORES = FACTORS + ['Growth']
+
+# Columns of the score table written for each state
+RESULT_COLS = ['State_Code', 'State_Name', 'State_Type', 'Country_Code', 'Country_Name', 'Species'] + FACTORS + \
+              ['Growth']
+
+# Fertility classes as ordinals, shared by the plant and state columns
+FERTILITY_LEVELS = {'high': 3, 'moderate': 2, 'low': 1}
+
+# Plant boundary columns each state column is compared with by cultivation()
+STATE_BOUNDS = {'Alt': ['Alt_Abs_Max'],
+                'Rain': ['Rain_Abs_Min', 'Rain_Abs_Max', 'Rain_Opt_Min', 'Rain_Opt_Max'],
+                'pH': ['pH_Abs_Min', 'pH_Abs_Max', 'pH_Opt_Min', 'pH_Opt_Max'],
+                'Temp_Min': ['Temp_Abs_Min', 'Temp_Opt_Min'],
+                'Temp_Max': ['Temp_Abs_Max', 'Temp_Opt_Max'],
+                'Cycle': ['Cycle_Min', 'Cycle_Max']}
+
+# State columns whose check in cultivation() fails when the state value is missing. Every comparison with a missing
+# value is false, so a missing value in the other columns fails no check
+MISSING_FAILS = ['Cycle']
+
+# Bit flag of each texture class, so a plant's texture list or a state's texture class is stored as one integer
+TEXTURE_BITS = {'heavy': 1, 'medium': 2, 'light': 4, 'organic': 8, 'wide': 16}
+
 
 def cultivation(plantrow, staterow):
     '''
@@ -134,35 +171,582 @@ def cultivation(plantrow, staterow):
 
 
 
-if __name__ == '__main__':
+def _state_rows(states):
+    '''
+    This function turns a single state row (a pandas series) into a one row dataframe, and returns dataframes and
+    tables as they are.
+    '''
+
+    if getattr(states, 'ndim', 2) == 1:
+        return states.to_frame().T
+
+    return states
+
+
+def range_score(env, abs_min, abs_max, opt_min, opt_max):
+    '''
+    This function is the column version of the rainfall and pH checks in cultivation(). The state values are
+    given as a column (states x 1) and the plant boundaries as rows (crops), so the comparisons broadcast to a
+    states x crops array of 0, 1, and 2 scores.
+    '''
+
+    conditions = [(abs_min > env) | (abs_max < env),  # Outside the absolute range
+                  (abs_min < env) & (opt_min > env),  # Between absolute and optimal minimum
+                  (abs_max > env) & (opt_max < env)]  # Between optimal and absolute maximum
+
+    return np.select(conditions, [0, 1, 1], default=2).astype(np.int8)
+
+
+def min_score(env, abs_min, opt_min):
+    '''
+    This function is the column version of the minimum temperature check in cultivation().
+    '''
+
+    conditions = [abs_min > env,
+                  (abs_min < env) & (opt_min > env)]
+
+    return np.select(conditions, [0, 1], default=2).astype(np.int8)
+
+
+def max_score(env, abs_max, opt_max):
+    '''
+    This function is the column version of the maximum temperature check in cultivation().
+    '''
+
+    conditions = [abs_max < env,
+                  (abs_max > env) & (opt_max < env)]
+
+    return np.select(conditions, [0, 1], default=2).astype(np.int8)
+
+
+def texture_flags(texts):
+    '''
+    This function encodes texture lists such as 'heavy, medium, light' or single texture classes as int8 bit flags.
+    Each distinct text is split once, and unknown classes have no flag.
+    '''
+
+    uniques, inverse = np.unique(np.asarray(texts, dtype=str), return_inverse=True)
+    flags = np.array([sum(TEXTURE_BITS.get(t, 0) for t in set(text.split(', '))) for text in uniques], dtype=np.int8)
+
+    return flags[inverse.ravel()]
+
+
+def fertility_ordinals(classes):
+    '''
+    This function encodes fertility classes as int8 ordinals, looking each distinct class up once.
+    '''
+
+    uniques, inverse = np.unique(np.asarray(classes, dtype=str), return_inverse=True)
+    levels = np.array([FERTILITY_LEVELS[f] for f in uniques], dtype=np.int8)
+
+    return levels[inverse.ravel()]
+
+
+def encode_plants(plants):
+    '''
+    This function returns the plant dataframe with its texture lists encoded as bit flags ('Texture_Abs_Flags',
+    'Texture_Opt_Flags') and its fertility classes as ordinals ('Fertility_Abs_Level', 'Fertility_Opt_Level'), so
+    the scoring functions do not have to encode them on every call.
+    '''
+
+    return plants.assign(Texture_Abs_Flags=texture_flags(plants['Texture_Abs']),
+                         Texture_Opt_Flags=texture_flags(plants['Texture_Opt']),
+                         Fertility_Abs_Level=fertility_ordinals(plants['Fertility_Abs']),
+                         Fertility_Opt_Level=fertility_ordinals(plants['Fertility_Opt']))
+
+
+def encode_states(states):
+    '''
+    This function returns the state dataframe with its texture class encoded as a bit flag ('Texture_Flags') and
+    its fertility class as an ordinal ('Fertility_Level').
+    '''
+
+    return states.assign(Texture_Flags=texture_flags(states['Texture']),
+                         Fertility_Level=fertility_ordinals(states['Fertility']))
+
+
+def plant_codes(plants):
+    '''
+    This function returns the absolute and optimal texture flags and fertility ordinals of the plants, taken from
+    the columns added by encode_plants() when present and encoded otherwise.
+    '''
+
+    if 'Texture_Abs_Flags' in plants:
+        return tuple(np.asarray(plants[col], dtype=np.int8) for col in
+                     ['Texture_Abs_Flags', 'Texture_Opt_Flags', 'Fertility_Abs_Level', 'Fertility_Opt_Level'])
+
+    return (texture_flags(plants['Texture_Abs']), texture_flags(plants['Texture_Opt']),
+            fertility_ordinals(plants['Fertility_Abs']), fertility_ordinals(plants['Fertility_Opt']))
+
+
+def state_codes(states):
+    '''
+    This function returns the texture flags and fertility ordinals of the states, taken from the columns added by
+    encode_states() when present and encoded otherwise.
+    '''
+
+    if 'Texture_Flags' in states:
+        return np.asarray(states['Texture_Flags'], dtype=np.int8), np.asarray(states['Fertility_Level'], dtype=np.int8)
+
+    return texture_flags(states['Texture']), fertility_ordinals(states['Fertility'])
+
+
+def texture_score(env, text_abs, text_opt):
+    '''
+    This function takes the state texture flags and the plant absolute and optimal texture flags and returns the
+    states x crops texture scores. A state's texture is in a plant's list when their flags share a bit.
+    '''
+
+    env = env[:, None]
+
+    return np.where((env & text_abs) != 0, np.where((env & text_opt) != 0, 2, 1), 0).astype(np.int8)
+
+
+def fertility_score(env, fert_abs, fert_opt):
+    '''
+    This function takes the state fertility ordinals and the plant absolute and optimal fertility ordinals and
+    returns the states x crops fertility scores.
+    '''
+
+    env = env[:, None]
+
+    return np.select([env < fert_abs, env < fert_opt], [0, 1], default=2).astype(np.int8)
+
+
+def growth_score(scores):
+    '''
+    This function takes the stacked factor scores (factors x states x crops) and applies the growth rule of
+    cultivation(): any 0 gives 0, a mean of 1 gives 1, a mean between 1 and 2 gives 2, and a mean of 2 gives 3.
+    '''
+
+    total = scores.sum(axis=0, dtype=np.int16)
+    n = scores.shape[0]
+    conditions = [(scores == 0).any(axis=0),
+                  total == n,
+                  (total > n) & (total < 2*n),
+                  total == 2*n]
+
+    return np.select(conditions, [0, 1, 2, 3], default=0).astype(np.int8)
+
+
+def factor_scores(plants, states):
+    '''
+    This function reads in the whole plant dataframe and one or more state rows and scores every plant against
+    every state at once. It returns a dictionary of states x crops int8 arrays keyed by factor name, plus 'Growth',
+    with the same values cultivation() gives for each pair.
+    '''
+
+    states = _state_rows(states)
+
+    def env(col):  # State column as a (states x 1) float array
+        return np.asarray(states[col], dtype=float)[:, None]
+
+    def req(col):  # Plant column as a (crops) float array
+        return np.asarray(plants[col], dtype=float)
+
+    text_abs, text_opt, fert_abs, fert_opt = plant_codes(plants)
+    text_env, fert_env = state_codes(states)
+
+    scores = {
+        'Alt': np.where(req('Alt_Abs_Max') < env('Alt'), 0, 2).astype(np.int8),
+        'Rain': range_score(env('Rain'), req('Rain_Abs_Min'), req('Rain_Abs_Max'),
+                            req('Rain_Opt_Min'), req('Rain_Opt_Max')),
+        'pH': range_score(env('pH'), req('pH_Abs_Min'), req('pH_Abs_Max'),
+                          req('pH_Opt_Min'), req('pH_Opt_Max')),
+        'Temp_Min': min_score(env('Temp_Min'), req('Temp_Abs_Min'), req('Temp_Opt_Min')),
+        'Temp_Max': max_score(env('Temp_Max'), req('Temp_Abs_Max'), req('Temp_Opt_Max')),
+        'Texture': texture_score(text_env, text_abs, text_opt),
+        'Fertility': fertility_score(fert_env, fert_abs, fert_opt),
+        'Cycle': np.where((env('Cycle') >= req('Cycle_Min')) & (env('Cycle') <= req('Cycle_Max')),
+                          2, 0).astype(np.int8),
+    }
+    scores['Growth'] = growth_score(np.stack([scores[f] for f in FACTORS]))
+
+    return scores
+
+
+def growth_passes(plants, states):
+    '''
+    This function returns a states x crops boolean array of the pairs with a growth score above 0, which are the
+    pairs where no state value is outside the plant's absolute boundaries. It only makes the absolute comparisons,
+    so it is cheaper than factor_scores() when the degree of success is not needed.
+    '''
+
+    states = _state_rows(states)
 
-    # Initialize dataframes
-    plants = pd.read_csv('ecocrop_files/ecocrop_cleaned.csv', header = 0)
-    plants = plants.set_index('Species', drop=False)
-    states = pd.read_csv('processed_env_files/env_var.csv', header= 0)
-    states = states.set_index('State_Code', drop=False)
+    def env(col):  # State column as a (states x 1) float array
+        return np.asarray(states[col], dtype=float)[:, None]
 
-    # Choose State
-    staterow = states.loc['TZA.14_1']
+    def req(col):  # Plant column as a (crops) float array
+        return np.asarray(plants[col], dtype=float)
 
-    # Initialize results df
-    cols= ['State_Code', 'State_Name', 'State_Type',
-               'Country_Code', 'Country_Name', 'Species',
-               'Alt', 'Rain', 'pH', 'Temp_Min', 'Temp_Max', 'Texture', 'Fertility', 'Cycle', 'Growth']
-    resdf = pd.DataFrame(columns=cols)
+    ok = ~(req('Alt_Abs_Max') < env('Alt'))
+    for var in ['Rain', 'pH']:
+        x = env(var)
+        ok &= ~((req(var + '_Abs_Min') > x) | (req(var + '_Abs_Max') < x))
+    ok &= ~(req('Temp_Abs_Min') > env('Temp_Min'))
+    ok &= ~(req('Temp_Abs_Max') < env('Temp_Max'))
+    ok &= (env('Cycle') >= req('Cycle_Min')) & (env('Cycle') <= req('Cycle_Max'))
+    text_abs, _, fert_abs, _ = plant_codes(plants)
+    text_env, fert_env = state_codes(states)
+    ok &= (text_env[:, None] & text_abs) != 0
+    ok &= fert_env[:, None] >= fert_abs
 
+    return ok
 
-    for name in plants.index:
-        plantrow = plants.loc[name]
-        results = cultivation(plantrow, staterow)
-        res_ser = pd.Series(results, index=resdf.columns, name=name)
-        resdf = resdf.append(res_ser)
-    resdf.to_csv('{}_{}_{}_scores.csv'.format(staterow['State_Name'],staterow['State_Type'],
-                                              staterow['Country_Name']), header=True, index=False)
+
+def _fraction(num, den):
+    '''
+    This function returns num/den clipped to [0, 1], taking a zero width range as fully satisfied.
+    '''
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where(den > 0, num/den, 1.0)
+
+    return np.clip(np.nan_to_num(frac, nan=1.0), 0, 1)
+
+
+def continuous_scores(plants, states, scores=None):
+    '''
+    This function gives each plant and state pair a continuous suitability score between 0 and 1 so that plants
+    with the same growth score can be ranked. Each factor gets partial credit: 0 outside the absolute range,
+    0 to 0.5 between the absolute and optimal boundaries depending on how close the state value is to the optimal
+    range, and 0.5 to 1 inside the optimal range depending on how far the value is from its edges. The score is the
+    mean credit over the factors, and 0 for any pair with a growth score of 0. It returns a states x crops float32
+    array. The factor scores are computed unless given.
+    '''
+
+    states = _state_rows(states)
+    if scores is None:
+        scores = factor_scores(plants, states)
+
+    def env(col):  # State column as a (states x 1) float array
+        return np.asarray(states[col], dtype=float)[:, None]
+
+    def req(col):  # Plant column as a (crops) float array
+        return np.asarray(plants[col], dtype=float)
+
+    def credit(score, marginal, optimal):  # Combine the factor score with the distances
+        return np.where(score == 0, 0, np.where(score == 1, 0.5*marginal, 0.5 + 0.5*optimal))
+
+    credits = []
+    for var in ['Rain', 'pH']:
+        x = env(var)
+        amin, amax = req(var + '_Abs_Min'), req(var + '_Abs_Max')
+        omin, omax = req(var + '_Opt_Min'), req(var + '_Opt_Max')
+        marginal = np.where(x < omin, _fraction(x - amin, omin - amin), _fraction(amax - x, amax - omax))
+        optimal = _fraction(np.minimum(x - omin, omax - x), (omax - omin)/2)
+        credits.append(credit(scores[var], marginal, optimal))
+
+    x, amin, omin = env('Temp_Min'), req('Temp_Abs_Min'), req('Temp_Opt_Min')
+    width = req('Temp_Opt_Max') - omin
+    credits.append(credit(scores['Temp_Min'], _fraction(x - amin, omin - amin), _fraction(x - omin, width)))
+
+    x, amax, omax = env('Temp_Max'), req('Temp_Abs_Max'), req('Temp_Opt_Max')
+    credits.append(credit(scores['Temp_Max'], _fraction(amax - x, amax - omax), _fraction(omax - x, width)))
+
+    amax = req('Alt_Abs_Max')
+    credits.append(credit(scores['Alt'], 0, _fraction(amax - env('Alt'), amax)))
+
+    x, cmin, cmax = env('Cycle'), req('Cycle_Min'), req('Cycle_Max')
+    credits.append(credit(scores['Cycle'], 0, _fraction(np.minimum(x - cmin, cmax - x), (cmax - cmin)/2)))
+
+    credits.append(scores['Texture']/2)  # Categorical factors only have their class
+    credits.append(scores['Fertility']/2)
+
+    total = np.mean(credits, axis=0)
+
+    return np.where(scores['Growth'] > 0, total, 0).astype(np.float32)
+
+
+def cultivation_batch(plants, states):
+    '''
+    This function is the batch version of cultivation(). It scores the whole plant dataframe against one or
+    more state rows and returns the score table with one row per state and plant, in the same column layout
+    as the rows returned by cultivation().
+    '''
+
+    states = _state_rows(states)
+
+    import pandas as pd
+
+    scores = factor_scores(plants, states)
+    n_states, n_crops = len(states), len(plants)
+
+    resdf = pd.DataFrame({col: np.repeat(np.asarray(states[col]), n_crops) for col in RESULT_COLS[:5]})
+    resdf['Species'] = np.tile(np.asarray(plants['Species']), n_states)
+    for col in FACTORS + ['Growth']:
+        resdf[col] = scores[col].ravel()
+
+    return resdf
+
+
+def state_classes(plants, states, tolerance=None, raw=()):
+    '''
+    This function groups the states into classes that get the same scores from every plant, so each class only has
+    to be scored once. Each value cultivation() compares is replaced by its place among the plant boundaries it is
+    compared with (below, equal to, or between which boundaries), so states whose values sit between the same
+    boundaries share a class and the grouping is exact. Columns listed in raw are compared by value instead, which
+    keeps the classes valid when those columns are shifted, as in climate scenarios. A tolerance, given as one step
+    for every column or as a dictionary of steps by column, rounds the values to multiples of the step first, so
+    near identical states share a class; the scores are then those of each class's first state and approximate.
+    It returns the row position of the first state of each class and the class of every state.
+    '''
+
+    keys = []
+    for col, bounds in STATE_BOUNDS.items():
+        x = np.asarray(states[col], dtype=float)
+        step = tolerance.get(col) if isinstance(tolerance, dict) else tolerance
+        if step:
+            x = np.round(x/step)*step
+        if col in raw:
+            keys.append(x)
+            continue
+        b = np.unique(np.asarray(plants[bounds[0]], dtype=float) if len(bounds) == 1 else
+                      np.concatenate([np.asarray(plants[c], dtype=float) for c in bounds]))
+        b = b[~np.isnan(b)]
+        pos = np.searchsorted(b, x, side='left')
+        equal = (pos < len(b)) & (b[np.minimum(pos, len(b) - 1)] == x)
+        keys.append(2*pos + equal)
+    keys.extend(state_codes(states))
+
+    _, first, inverse = np.unique(np.column_stack(keys), axis=0, return_index=True, return_inverse=True)
+
+    return first, inverse.ravel()
+
+
+def _rows(table, start, stop):
+    '''
+    This function returns rows start to stop of a dataframe or of a table from crop_tables.py.
+    '''
+
+    if hasattr(table, 'iloc'):  # Dataframe
+        return table.iloc[start:stop]
+
+    return table[start:stop]
+
+
+def _take(table, rows):
+    '''
+    This function returns the given row positions of a dataframe or of a table from crop_tables.py.
+    '''
+
+    if hasattr(table, 'iloc'):  # Dataframe
+        return table.iloc[rows]
+
+    return table[rows]
+
+
+
+_worker_plants = None
+
+
+def _init_worker(plants):
+    '''
+    This function stores the plant dataframe in each worker process so it is only sent once per worker.
+    '''
+
+    global _worker_plants
+    _worker_plants = plants
+
+
+def _score_chunk(start, states):
+    '''
+    This function scores one chunk of states in a worker process and returns its first row number and its
+    layers of the suitability matrix.
+    '''
+
+    scores = factor_scores(_worker_plants, states)
+
+    return start, np.stack([scores[f] for f in SCORES])
+
+
+def suitability_matrix(plants, states, chunk_size=256, workers=None, out=None, dedupe=False,
+                       tolerance=None):
+    '''
+    This function scores every plant against every state and returns the suitability matrix as an int8 array
+    of shape (factors, states, crops), with the layers in the order of SCORES. The states are scored in chunks
+    of chunk_size rows so the temporary arrays stay small, and the chunks are spread over worker processes
+    (all cores by default, or in this process if workers is 1). The result is written into out if given,
+    which may be a memory-mapped array. With dedupe, only the first state of each class from state_classes() is
+    scored and its scores are copied to the rest of the class.
+    '''
+
+    n_states, n_crops = len(states), len(plants)
+    if out is None:
+        out = np.zeros((len(SCORES), n_states, n_crops), dtype=np.int8)
+
+    if dedupe:
+        first, inverse = state_classes(plants, states, tolerance)
+        block = suitability_matrix(plants, _take(states, first), chunk_size, workers)
+        for start in range(0, n_states, chunk_size):
+            out[:, start:start + chunk_size] = block[:, inverse[start:start + chunk_size]]
+        return out
+
+    # Encode the texture and fertility classes once rather than for every chunk
+    if 'Texture_Abs_Flags' not in plants:
+        plants = encode_plants(plants)
+    if 'Texture_Flags' not in states:
+        states = encode_states(states)
+
+    starts = range(0, n_states, chunk_size)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(starts) == 1:
+        for start in starts:
+            scores = factor_scores(plants, _rows(states, start, start + chunk_size))
+            out[:, start:start + chunk_size] = np.stack([scores[f] for f in SCORES])
+        return out
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(plants,)) as pool:
+        pending = set()
+        for start in starts:
+            pending.add(pool.submit(_score_chunk, start, _rows(states, start, start + chunk_size)))
+            if len(pending) >= 2*workers:  # Keep a bounded number of chunks in flight
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    first, block = future.result()
+                    out[:, first:first + block.shape[1]] = block
+        for future in pending:
+            first, block = future.result()
+            out[:, first:first + block.shape[1]] = block
+
+    return out
+
+
+def select_states(states, codes=(), countries=(), everything=False):
+    '''
+    This function returns the row positions of the chosen states as an integer array: every state, or the given
+    state codes (GID_1) and every state of the given country codes (GID_0), or TZA.14_1 if nothing is chosen. It
+    raises a ValueError naming any unknown code, or if no state is chosen.
+    '''
+
+    if everything:
+        return np.arange(len(states))
+
+    codes = list(codes) or ([] if countries else ['TZA.14_1'])
+    index = {code: i for i, code in enumerate(np.asarray(states['State_Code']).tolist())}
+    unknown = [code for code in codes if code not in index]
+    if unknown:
+        raise ValueError('unknown state codes: {}'.format(', '.join(unknown)))
+    country_codes = np.asarray(states['Country_Code'])
+    known = set(country_codes.tolist())
+    unknown = [code for code in countries if code not in known]
+    if unknown:
+        raise ValueError('unknown country codes: {}'.format(', '.join(unknown)))
+
+    rows = [index[code] for code in codes] + np.flatnonzero(np.isin(country_codes, list(countries))).tolist()
+    rows = np.unique(np.array(rows, dtype=int))
+    if len(rows) == 0:
+        raise ValueError('no states chosen')
+
+    return rows
+
+
+def scores_path(names, folder='.'):
+    '''
+    This function returns the score file path of a state from its name, type, and country name.
+    '''
+
+    return os.path.join(folder, '{}_{}_{}_scores.csv'.format(names['State_Name'], names['State_Type'],
+                                                            names['Country_Name']))
 
 
+def _csv_cell(value):
+    '''
+    This function formats a value as a csv cell, quoting it when it holds a comma, quote, or line break as the csv
+    module and pandas do.
+    '''
+
+    text = str(value)
+    if any(c in text for c in ',"\r\n'):
+        text = '"' + text.replace('"', '""') + '"'
+
+    return text
 
 
+def write_state_scores(plants, states, folder='.'):
+    '''
+    This function scores the plants against a group of states and writes one score file per state, in the layout
+    of the rows returned by cultivation(). The species cells are formatted once, and the single digit scores of
+    each state are turned into text as one byte array. It returns the paths written.
+    '''
+
+    scores = factor_scores(plants, states)
+    block = np.stack([scores[f] for f in SCORES], axis=-1)  # states x crops x scores
+    species = [_csv_cell(name) + ',' for name in np.asarray(plants['Species']).tolist()]
+    names = {col: np.asarray(states[col]).tolist() for col in RESULT_COLS[:5]}
+    header = ','.join(RESULT_COLS) + '\n'
 
+    # Score digits separated by commas and ended by a newline, one row of bytes per plant
+    text = np.full((block.shape[1], 2*len(SCORES)), ord(','), dtype=np.uint8)
+    text[:, -1] = ord('\n')
+
+    paths = []
+    for i in range(len(states)):
+        state = ''.join(_csv_cell(names[col][i]) + ',' for col in RESULT_COLS[:5])
+        text[:, 0::2] = block[i] + ord('0')
+        digits = text.view('S{}'.format(text.shape[1])).ravel().astype(str)
+        path = scores_path({col: names[col][i] for col in RESULT_COLS[:5]}, folder)
+        with open(path, 'w', newline='') as f:
+            f.write(header)
+            f.write(''.join([state + cell + row for cell, row in zip(species, digits)]))
+        paths.append(path)
+
+    return paths
+
+
+def _write_chunk(states, folder):
+    '''
+    This function writes the score files of one group of states in a worker process.
+    '''
 
+    return write_state_scores(_worker_plants, states, folder)
+
+
+def write_scores(plants, states, folder='.', chunk_size=64, workers=None):
+    '''
+    This function writes the score files of every state, spreading groups of chunk_size states over worker
+    processes (all cores by default, or in this process if workers is 1). It returns the number of files written.
+    '''
+
+    starts = range(0, len(states), chunk_size)
+    workers = min(workers or os.cpu_count() or 1, len(starts))
+
+    if workers <= 1:
+        return sum(len(write_state_scores(plants, _rows(states, start, start + chunk_size), folder))
+                   for start in starts)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(plants,)) as pool:
+        futures = [pool.submit(_write_chunk, _rows(states, start, start + chunk_size), folder) for start in starts]
+
+        return sum(len(future.result()) for future in futures)
+
+
+
+if __name__ == '__main__':
 
+    parser = argparse.ArgumentParser(description='Score the plant list against states and write one file per state.')
+    parser.add_argument('states', nargs='*', help='state codes (GID_1), TZA.14_1 if nothing is chosen')
+    parser.add_argument('--country', nargs='+', default=[], help='score every state of these country codes (GID_0)')
+    parser.add_argument('--all', action='store_true', help='score every state')
+    parser.add_argument('--folder', default='.', help='folder for the score files')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, all cores by default')
+    args = parser.parse_args()
+
+    from crop_tables import CropTable, StateTable  # Imported here as crop_tables imports this module
+
+    # Initialize tables
+    plants = CropTable.read('ecocrop_files/ecocrop_cleaned.csv')
+    states = StateTable.read('processed_env_files/env_var.csv')
+
+    # Choose states
+    try:
+        rows = select_states(states, args.states, args.country, args.all)
+    except ValueError as error:
+        parser.error(str(error))
+
+    # Score every plant against the states
+    os.makedirs(args.folder, exist_ok=True)
+    written = write_scores(plants, states[rows], args.folder, workers=1 if len(rows) <= 64 else args.workers)
+    print('{} score files written'.format(written))
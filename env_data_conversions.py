@@ -12,41 +12,37 @@ outputs: 'processed_*.csv'
 
 """
 
+import argparse
+import sys
+
 import pandas as pd
 
 
-def consolidate(df, variable):
+def progress(done, total, label, width=30):
     """
-    This function takes the soil df dataframe, creates a new dataframe out of the subnational jurisdiction
-    code unique values, and takes the average of each attribute for each jurisdiction value. It maps them
-    and returns a consolidated dataframe with average soil attribute values for each location.
+    This function draws a one line progress bar on the terminal, overwriting the previous one.
     """
 
-    # Create new df from unique subnational values
-
-    datadf = pd.DataFrame(0, index = df['GID_1'].unique(), columns=df.columns)
-
-    ticker = 1
-    # Create means for each variable
-    for name in datadf.index:  # Loop through each unique subnational name
-
-        var = df.loc[df['GID_1'] == name, 'grid_code'].mean()  # Use mean for float columns
-
-        g0 = df.loc[df['GID_1'] == name, 'GID_0'].to_list()[0]  # All these values will be the same
-
-        n0 = df.loc[df['GID_1'] == name, 'NAME_0'].to_list()[0]
-
-        g1 = df.loc[df['GID_1'] == name, 'GID_1'].to_list()[0]
-
-        n1 = df.loc[df['GID_1'] == name, 'NAME_1'].to_list()[0]
+    filled = int(width*done/total)
+    sys.stdout.write('\r[{}{}] {}/{} {:<20}'.format('#'*filled, ' '*(width - filled), done, total, label))
+    if done == total:
+        sys.stdout.write('\n')
+    sys.stdout.flush()
 
-        en = df.loc[df['GID_1'] == name, 'ENGTYPE_1'].to_list()[0]
 
+def consolidate(df, variable):
+    """
+    This function takes the attribute df dataframe and takes the average of the attribute for each subnational
+    jurisdiction in a single grouped pass. It returns a consolidated dataframe with one row per jurisdiction, in
+    the order they first appear, holding the average attribute value and the jurisdiction's names and codes.
+    """
 
+    # Names and codes are the same for every row of a jurisdiction, so take them from its first row
+    datadf = df.drop_duplicates('GID_1').set_index('GID_1', drop=False)
+    datadf.index.name = None
 
-        datadf.loc[name] = [var, g0, n0, g1, n1, en]
-        print('row', ticker)
-        ticker+=1
+    # Create means for each jurisdiction in one pass
+    datadf['grid_code'] = df.groupby('GID_1', sort=False)['grid_code'].mean()
 
     datadf.rename(columns={'grid_code': variable}, inplace=True)
 
@@ -59,6 +55,10 @@ def consolidate(df, variable):
 
 if __name__ == '__main__':
 
+    parser = argparse.ArgumentParser(description='Average the checked join files by subnational jurisdiction.')
+    parser.add_argument('--quiet', action='store_true', help='do not show progress')
+    args = parser.parse_args()
+
     file_list = ['diurnal', 'dry_seasons', 'precip', 'el', 'growing_period', 'wet_temp']
 
     variable_names = ['temp_difference', 'dry_season_type', 'precipitation', 'elevation',
@@ -67,11 +67,7 @@ if __name__ == '__main__':
     # Consolidate the subnational jurisdictions by averaging all values within them
     for i in range(0,6):
         df = pd.read_csv('raw_env_var_csv/checked_{}_join.csv'.format(file_list[i]))
-        print('csv {} read'.format(file_list[i]))
         consoldf = consolidate(df, variable_names[i])
-        print('csv {} consolidated'.format(i))
         consoldf.to_csv('processed_env_files/processed_{}.csv'.format(file_list[i]), header=True, index=False)
-
-
-
-
+        if not args.quiet:
+            progress(i + 1, 6, file_list[i])
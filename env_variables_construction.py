@@ -5,15 +5,29 @@ Programmer: Steven Doyle
 Date: 04.29.2021
 
 This script reads in the processed environmental attributes csvs, merges them together, and transforms
-them into eco-crop compatible variables.
+them into eco-crop compatible variables. Run with '--percentile-temps' to take the minimum and maximum temperatures
+from the low and high percentiles of each state's wet season temperatures in 'stats_wet_temp.csv' instead of their
+average.
 
-inputs: 'processed_*.csv'
+inputs: 'processed_*.csv', 'stats_wet_temp.csv' with '--percentile-temps'
 outputs: 'env_var.csv'
 
 """
 
+import argparse
+
+import numpy as np
 import pandas as pd
 
+from table_cache import read_table
+
+
+# Productive days per year for each rounded growing period category, 365 for any higher category
+GROWING_DAYS = np.array([0, 0, 29, 59, 89, 119, 149, 179, 209, 239, 269, 299, 329, 364])
+
+# Dry season frequency multiplier for each rounded dry season type category, 1 for any other category
+DRY_SEASON_MULT = np.array([0, 1/4, 1, 1, 1/2])
+
 
 def drop_nas(df):
     '''
@@ -59,108 +73,89 @@ def temps(df):
     df['Temp_Min'] = df['wet_temp'] - df['temp_difference']/2
     df['Temp_Max'] = df['wet_temp'] + df['temp_difference']/2
 
-    df = df.drop(columns=['wet_temp', 'temp_difference'], axis=1)  # Drop these columns as they are no longer useful
+    df = df.drop(columns=['wet_temp', 'temp_difference'])  # Drop these columns as they are no longer useful
 
     return df
 
 
-def textures(df, row):
+def percentile_temps(df, stats, low='p05', high='p95'):
     '''
-    This function reads in the df and uses the sand, silt, clay, and organic carbon columns to determine
-    the texture class of the soil using accepted classification methods. It adds the class as a column,
-    deletes the used ones, and returns the df.
+    This function works like temps, but starts the minimum temperature from the low percentile and the maximum
+    temperature from the high percentile of the wet season temperatures of each state's grid points, read from the
+    stats dataframe indexed by state code, rather than from their average.
     '''
 
-    if df['OC'][row] >= 5:  # If soil has at least 5% organic carbon, it's organic regardless of anything else
-        texture = 'organic'
-    else:  # If not organic, texture is the dominant particle size
-        if df['Sand'][row] > df['Silt'][row] and df['Sand'][row] > df['Clay'][row]:
-            texture = 'light'
-        elif df['Silt'][row] > df['Sand'][row] and df['Silt'][row] > df['Clay'][row]:
-            texture = 'medium'
-        elif df['Clay'][row] > df['Sand'][row] and df['Clay'][row] > df['Silt'][row]:
-            texture = 'heavy'
-        else:  # If no clear dominator exists, the texture is considered wide
-            texture = 'wide'
+    df['Temp_Min'] = df.index.map(stats[low]) - df['temp_difference']/2
+    df['Temp_Max'] = df.index.map(stats[high]) + df['temp_difference']/2
 
-    return texture
+    df = df.drop(columns=['wet_temp', 'temp_difference'])
+
+    return df
 
 
-def fert(df, row):
+def textures(df):
     '''
-    This function takes in a C:N ratio and returns a string stating the degree of fertility in the soil.
+    This function reads in the df and uses the sand, silt, clay, and organic carbon columns to determine
+    the texture class of the soil of every row using accepted classification methods. It returns the
+    classes as an array.
     '''
 
-    if df['CN'][row] > 16:  # Low fertility
-        fertility = 'low'
-    elif df['CN'][row] < 9:  # High fertility
-        fertility = 'high'
-    else:
-        fertility = 'moderate'  # Moderate
+    sand, silt, clay = df['Sand'].to_numpy(), df['Silt'].to_numpy(), df['Clay'].to_numpy()
 
+    conditions = [df['OC'].to_numpy() >= 5,  # If soil has at least 5% organic carbon, it's organic regardless
+                  (sand > silt) & (sand > clay),  # If not organic, texture is the dominant particle size
+                  (silt > sand) & (silt > clay),
+                  (clay > sand) & (clay > silt)]
 
-    return fertility
+    return np.select(conditions, ['organic', 'light', 'medium', 'heavy'], default='wide')  # No clear dominator is wide
 
 
-def seasons(df, row):
+def fert(df):
     '''
-    This function takes in the growing period and dry season type categories and determines the length
-    of the longest growing season for that location. It returns this value.
+    This function takes in the C:N ratio column and returns an array stating the degree of fertility in the soil
+    of every row.
     '''
 
-    season = df['dry_season_type'][row].round()  # Round to category number
-    if season == 0:  # Dry season frequency multiplier
-        mult = 0
-    elif season == 1:
-        mult = 1/4
-    elif season == 4:
-        mult = 1/2
-    else:
-        mult = 1
-
-    gdd = df['growing_period'][row].round()
-    if gdd == 0:  # Total number of productive days per year category
-        days = 0
-    elif gdd == 1:
-        days = 0
-    elif gdd == 2:
-        days = 29
-    elif gdd == 3:
-        days = 59
-    elif gdd == 4:
-        days = 89
-    elif gdd == 5:
-        days = 119
-    elif gdd == 6:
-        days = 149
-    elif gdd == 7:
-        days = 179
-    elif gdd == 8:
-        days = 209
-    elif gdd == 9:
-        days = 239
-    elif gdd == 10:
-        days = 269
-    elif gdd == 11:
-        days = 299
-    elif gdd == 12:
-        days = 329
-    elif gdd == 13:
-        days = 364
-    else:
-        days = 365
+    cn = df['CN'].to_numpy()
+
+    return np.select([cn > 16, cn < 9], ['low', 'high'], default='moderate')  # Low, high, otherwise moderate
+
+
+def seasons(df):
+    '''
+    This function takes in the growing period and dry season type category columns and determines the length
+    of the longest growing season for every row. It looks the rounded categories up in the productive days and
+    dry season multiplier tables and returns the lengths as an array.
+    '''
+
+    season = df['dry_season_type'].to_numpy(dtype=float).round()  # Round to category number
+    valid = (season >= 0) & (season < len(DRY_SEASON_MULT))
+    mult = np.where(valid, DRY_SEASON_MULT[np.clip(season, 0, len(DRY_SEASON_MULT) - 1).astype(int)], 1)
+
+    gdd = df['growing_period'].to_numpy(dtype=float).round()
+    valid = (gdd >= 0) & (gdd < len(GROWING_DAYS))
+    days = np.where(valid, GROWING_DAYS[np.clip(gdd, 0, len(GROWING_DAYS) - 1).astype(int)], 365)
 
     length = days * mult  # Length of growing season is a product of days and dry season frequency
 
-    return length
+    # Seasons with a whole multiplier are whole days, kept as integers so the csv output is unchanged
+    whole = (mult == 0) | (mult == 1)
+    length = length.astype(object)
+    length[whole] = length[whole].astype(int)
 
+    return length
 
 
 if __name__ == '__main__':
 
+    parser = argparse.ArgumentParser(description='Combine the processed files into the environmental variable file.')
+    parser.add_argument('--percentile-temps', nargs=2, metavar=('LOW', 'HIGH'), default=None,
+                        help="percentile columns of 'stats_wet_temp.csv' used for the temperatures, e.g. p05 p95")
+    args = parser.parse_args()
+
     # Create variables df using the diurnal csv as the frame
 
-    df = pd.read_csv('processed_env_files/processed_diurnal.csv', header=0)
+    df = read_table('processed_env_files/processed_diurnal.csv')
     df = df.set_index('GID_1', drop=False)
 
 
@@ -170,12 +165,12 @@ if __name__ == '__main__':
     var_list = ['dry_season_type', 'elevation', 'growing_period', 'precipitation', 'wet_temp']  # Variable name list
 
     for i in range(0,5):  # Loop for each of the above files and variables
-        var_df = pd.read_csv('processed_env_files/processed_{}.csv'.format(file_list[i]), header=0, index_col='GID_1')
+        var_df = read_table('processed_env_files/processed_{}.csv'.format(file_list[i])).set_index('GID_1')
         var = var_list[i]
         df[var] = df.index.map(var_df[var])  # Map the variables to the master list via their common index
 
     soil_list = ['Sand', 'Silt', 'Clay', 'OC', 'CN', 'pH']  # Variable names
-    soil_df = pd.read_csv('processed_env_files/processed_soil.csv', header=0, index_col='GID_1')
+    soil_df = read_table('processed_env_files/processed_soil.csv').set_index('GID_1')
     for i in range(0,6):
         var = soil_list[i]
         df[var] = df.index.map(soil_df[var])  # Map the variables to the master list via their common index
@@ -192,23 +187,18 @@ if __name__ == '__main__':
 
     # Format variable columns so they are compatible with the ecocrop variables
 
-    df = temps(df)  # Calc min and max temp for growing season (rainy season)
+    if args.percentile_temps:  # Calc min and max temp from the coldest and warmest parts of each state
+        stats = pd.read_csv('processed_env_files/stats_wet_temp.csv', header=0).set_index('GID_1')
+        df = percentile_temps(df, stats, *args.percentile_temps)
+    else:
+        df = temps(df)  # Calc min and max temp for growing season (rainy season)
     df = df.rename(columns={'precipitation':'Rain', 'elevation':'Alt'})  # Rename columns to match ecocrop
-    df['Texture'] = ''  # Make an empty column for texture
-    for row in range(0,len(df)):  # loop the texture calculator for each row
-        texture = textures(df, row)
-        df['Texture'][row] = texture
-    df = df.drop(columns=['OC', 'Sand', 'Silt', 'Clay'], axis=1)  # Drop unnecessary columns
-    df['Fertility'] = ''
-    for row in range(0, len(df)):  # Convert C:N ratio to Fertility
-        fertility = fert(df, row)
-        df['Fertility'][row] = fertility
-    df = df.drop(columns='CN', axis=1)
-    df['Cycle'] = ''
-    for row in range(0, len(df)):
-        days = seasons(df, row)
-        df['Cycle'][row] = days
-    df = df.drop(columns=['dry_season_type', 'growing_period'], axis=1)
+    df['Texture'] = textures(df)  # Texture class of every row
+    df = df.drop(columns=['OC', 'Sand', 'Silt', 'Clay'])  # Drop unnecessary columns
+    df['Fertility'] = fert(df)  # Convert C:N ratio to Fertility
+    df = df.drop(columns='CN')
+    df['Cycle'] = seasons(df)
+    df = df.drop(columns=['dry_season_type', 'growing_period'])
 
     df = df.rename(columns={'GID_1':'State_Code', 'NAME_1':'State_Name', 'ENGTYPE_1':'State_Type',
                             'GID_0':'Country_Code', 'NAME_0':'Country_Name'})  # Rename columns to be more intelligible
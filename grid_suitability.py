@@ -0,0 +1,113 @@
+#!/bin/env python
+"""
+Program: Grid Suitability
+Programmer: Steven Doyle
+Date: 05.19.2021
+
+This script scores the plant list against the individual grid points of the checked join files instead of the state
+averages, and reports the fraction of each state's grid points where each plant can be grown. The points are read and
+scored in chunks, so the join files never have to be held in memory at once. Attributes that are not available at
+grid point level are taken from the state's row in 'env_var.csv'. The growing period and dry season join files share
+the same grid, so the growing period length is worked out at each grid point and the other attributes use the state
+averages. The two files are checked to line up point for point.
+
+inputs: 'ecocrop_cleaned.csv', 'env_var.csv', 'checked_dry_seasons_join.csv', 'checked_growing_period_join.csv'
+outputs: 'grid_suitability.npz'
+
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from cultivation_function import FACTORS, growth_passes
+from env_variables_construction import seasons
+
+
+# Rows of the join files read at a time
+CHUNK_SIZE = 4096
+
+
+def grid_suitability(plants, states, points):
+    '''
+    This function takes the plant dataframe, the state dataframe, and the grid points, either as one dataframe or as
+    an iterable of dataframe chunks. Each point has a 'GID_1' column and any of the state attribute columns used by
+    the cultivation function; the rest are filled in from the point's state. Points in states missing from the state
+    dataframe are skipped. It returns a states x plants dataframe with the fraction of each state's points where each
+    plant can be grown, and the number of points in each state.
+    '''
+
+    if isinstance(points, pd.DataFrame):
+        points = [points[start:start + CHUNK_SIZE] for start in range(0, len(points), CHUNK_SIZE)]
+
+    state_pos = pd.Series(np.arange(len(states)), index=states['State_Code'].to_numpy())
+    suitable = np.zeros((len(states), len(plants)), dtype=np.int32)
+    totals = np.zeros(len(states), dtype=np.int64)
+
+    for chunk in points:
+        pos = chunk['GID_1'].map(state_pos)
+        chunk = chunk[pos.notna().to_numpy()]
+        pos = pos.dropna().to_numpy(dtype=int)
+        if len(pos) == 0:
+            continue
+
+        # Point values where available, state values otherwise
+        env = states.iloc[pos].reset_index(drop=True)
+        for col in FACTORS:
+            if col in chunk.columns:
+                env[col] = chunk[col].to_numpy()
+
+        passes = growth_passes(plants, env)
+
+        # Add the passing points of each state in the chunk
+        order = np.argsort(pos, kind='stable')
+        rows, first = np.unique(pos[order], return_index=True)
+        suitable[rows] += np.add.reduceat(passes[order], first, axis=0, dtype=np.int32)
+        totals[rows] += np.diff(np.append(first, len(pos)))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = (suitable/totals[:, None]).astype(np.float32)
+    fracdf = pd.DataFrame(fraction, index=states['State_Code'].to_numpy(), columns=plants['Species'].to_numpy())
+
+    return fracdf, pd.Series(totals, index=fracdf.index, name='Points')
+
+
+def cycle_points(folder='raw_env_var_csv'):
+    '''
+    This function reads the dry season and growing period join files side by side in chunks and yields the grid
+    points with their growing period length. The checked join files do not keep a point id, so the two files are
+    paired row by row, and a ValueError is raised if they have a different number of rows or if a row pair falls in
+    different states, which means a point was dropped from only one of them.
+    '''
+
+    dry = pd.read_csv('{}/checked_dry_seasons_join.csv'.format(folder), usecols=['grid_code', 'GID_1'],
+                      chunksize=CHUNK_SIZE)
+    grow = pd.read_csv('{}/checked_growing_period_join.csv'.format(folder), usecols=['grid_code', 'GID_1'],
+                       chunksize=CHUNK_SIZE)
+    row = 0
+    for d, g in itertools.zip_longest(dry, grow):
+        if d is None or g is None or len(d) != len(g):
+            raise ValueError('the dry season and growing period join files have a different number of rows')
+        mismatch = np.flatnonzero(d['GID_1'].to_numpy() != g['GID_1'].to_numpy())
+        if len(mismatch):
+            raise ValueError('the dry season and growing period join files are not aligned from row {} ({} and {})'
+                             .format(row + mismatch[0], d['GID_1'].iloc[mismatch[0]], g['GID_1'].iloc[mismatch[0]]))
+        row += len(d)
+
+        df = pd.DataFrame({'dry_season_type': d['grid_code'].to_numpy(dtype=float),
+                           'growing_period': g['grid_code'].to_numpy(dtype=float)})
+        yield pd.DataFrame({'GID_1': d['GID_1'].to_numpy(),
+                            'Cycle': seasons(df).astype(float)})
+
+
+if __name__ == '__main__':
+
+    # Initialize dataframes
+    plants = pd.read_csv('ecocrop_files/ecocrop_cleaned.csv', header=0)
+    states = pd.read_csv('processed_env_files/env_var.csv', header=0)
+
+    # Score every grid point and save the suitable fraction of each state
+    fracdf, totals = grid_suitability(plants, states, cycle_points())
+    np.savez('grid_suitability.npz', fraction=fracdf.to_numpy(), points=totals.to_numpy(),
+             state_codes=fracdf.index.to_numpy(dtype=str), species=fracdf.columns.to_numpy(dtype=str))
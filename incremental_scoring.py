@@ -0,0 +1,239 @@
+#!/bin/env python
+"""
+Program: Incremental Scoring
+Programmer: Steven Doyle
+Date: 05.17.2021
+
+This script keeps the score store up to date when plant rows in 'ecocrop_cleaned.csv' or state rows in 'env_var.csv'
+change. It compares the content hash of every plant and state row with the hashes in the store header and only
+rescores the plants and states whose hash has changed, along with the growth count roll-ups that depend on them: the
+number of plants with each growth score in every state and the number of states with each growth score for every
+plant. The roll-ups record the header they were counted against and are recounted when the store has been rebuilt
+since. Each run adds a line to a delta log listing what was rescored.
+
+inputs: 'ecocrop_cleaned.csv', 'env_var.csv'
+outputs: 'suitability_scores.npy', 'suitability_scores.json', 'suitability_scores.rollups.npz',
+'suitability_scores.delta.log'
+
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from cultivation_function import SCORES, suitability_matrix
+from score_store import STORE_PATH, ScoreStore, create_store, row_hashes, save_store, write_header
+
+
+# Layer of the growth score in the store and the number of growth classes
+GROWTH = SCORES.index('Growth')
+N_CLASSES = 4
+
+
+def class_counts(growth, axis):
+    '''
+    This function counts the growth scores of a 2d growth array along an axis and returns one count for each
+    growth class.
+    '''
+
+    return np.stack([(growth == c).sum(axis=axis) for c in range(N_CLASSES)], axis=-1).astype(np.int32)
+
+
+def _header_digest(path):
+    '''
+    This function returns a hash of the store header, which changes whenever the store is built or rescored.
+    '''
+
+    with open(path + '.json', 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _write_rollups(path, state_counts, crop_counts):
+    '''
+    This function saves the growth class counts of every state and every plant, along with the hash of the store
+    header they were counted against. The header must be written first.
+    '''
+
+    np.savez(path + '.rollups.npz', states=state_counts, species=crop_counts, header=_header_digest(path))
+
+
+def _read_rollups(path):
+    '''
+    This function returns the saved growth class counts of the states and plants, or None if there are none or they
+    were not counted against the current store header.
+    '''
+
+    if not os.path.exists(path + '.rollups.npz'):
+        return None
+    with np.load(path + '.rollups.npz') as rollups:
+        if 'header' not in rollups or str(rollups['header']) != _header_digest(path):
+            return None
+        return rollups['states'], rollups['species']
+
+
+def _log(path, delta):
+    '''
+    This function adds one line describing the rescored rows to the delta log.
+    '''
+
+    delta = dict(time=time.strftime('%Y-%m-%d %H:%M:%S'), **delta)
+    with open(path + '.delta.log', 'a') as f:
+        f.write(json.dumps(delta) + '\n')
+
+
+def _changes(old, current):
+    '''
+    This function compares two dictionaries of row hashes and returns the changed, added, and removed keys.
+    '''
+
+    changed = [key for key, h in current.items() if key in old and old[key] != h]
+    added = [key for key in current if key not in old]
+    removed = [key for key in old if key not in current]
+
+    return changed, added, removed
+
+
+def full_build(plants, states, path=STORE_PATH):
+    '''
+    This function scores everything, saves the store and the roll-ups, and logs a full run.
+    '''
+
+    tensor = create_store(path, plants['Species'], states)
+    suitability_matrix(plants, states, out=tensor)
+    tensor.flush()
+    growth = np.array(tensor[GROWTH])
+    del tensor
+    save_store(path, plants['Species'], states, hashes=(row_hashes(plants), row_hashes(states)))
+    _write_rollups(path, class_counts(growth, 1), class_counts(growth, 0))
+    _log(path, {'full': True, 'species': len(plants), 'states': len(states)})
+
+
+def update_store(plants, states, path=STORE_PATH):
+    '''
+    This function brings the store up to date with the given plant and state dataframes and returns the delta it
+    logged. The rows are compared with the hashes in the store header. Changed plants and states are rescored in
+    place. When plants or states have been added or removed, the store is rewritten with the kept scores copied over
+    and only the new rows scored. If there is no store yet, or it does not record its row hashes, everything is
+    scored.
+    '''
+
+    store = ScoreStore(path) if os.path.exists(path + '.npy') and os.path.exists(path + '.json') else None
+    if store is None or store.hashes is None:
+        del store
+        full_build(plants, states, path)
+        return {'full': True}
+
+    c_changed, c_added, c_removed = _changes(dict(zip(store.species, store.hashes['species'])),
+                                             dict(zip(plants['Species'], row_hashes(plants))))
+    s_changed, s_added, s_removed = _changes(dict(zip(store.states['State_Code'], store.hashes['states'])),
+                                             dict(zip(states['State_Code'], row_hashes(states))))
+    delta = {'changed_species': c_changed, 'added_species': c_added, 'removed_species': c_removed,
+             'changed_states': s_changed, 'added_states': s_added, 'removed_states': s_removed}
+
+    same_layout = (list(plants['Species']) == store.species and
+                   list(states['State_Code']) == list(store.states['State_Code']))
+
+    if same_layout:
+        _rescore_in_place(plants, states, path, c_changed, s_changed, store.tolerance)
+    else:
+        _rebuild(plants, states, path, store, set(c_changed), set(s_changed))
+    del store
+
+    _log(path, delta)
+
+    return delta
+
+
+def _rescore_in_place(plants, states, path, species, codes, tolerance=None):
+    '''
+    This function rescores the columns of the changed plants and the rows of the changed states in the memory-mapped
+    store and updates the roll-ups from the old and new growth scores of those rows and columns only. The header is
+    then rewritten with the current names and hashes. Roll-ups that were not counted against the store header are
+    recounted instead.
+    '''
+
+    rollups = _read_rollups(path)
+    if not species and not codes and rollups is not None:
+        return
+    if rollups is not None:
+        state_counts, crop_counts = rollups[0].copy(), rollups[1].copy()
+        os.remove(path + '.rollups.npz')  # Recounted on the next run if the rescoring is interrupted
+
+    tensor = np.load(path + '.npy', mmap_mode='r+')
+    growth = tensor[GROWTH]
+
+    if species:  # Rescore the plant columns against every state
+        cols = np.flatnonzero(plants['Species'].isin(species).to_numpy())
+        old = growth[:, cols].copy()
+        tensor[:, :, cols] = suitability_matrix(plants.iloc[cols], states, workers=1)
+        if rollups is not None:
+            state_counts += class_counts(growth[:, cols], 1) - class_counts(old, 1)
+            crop_counts[cols] = class_counts(growth[:, cols], 0)
+
+    if codes:  # Rescore the state rows against every plant
+        rows = np.flatnonzero(states['State_Code'].isin(codes).to_numpy())
+        old = growth[rows].copy()
+        tensor[:, rows] = suitability_matrix(plants, states.iloc[rows], workers=1)
+        if rollups is not None:
+            crop_counts += class_counts(growth[rows], 0) - class_counts(old, 0)
+            state_counts[rows] = class_counts(growth[rows], 1)
+
+    tensor.flush()
+    if rollups is None:
+        state_counts, crop_counts = class_counts(growth, 1), class_counts(growth, 0)
+
+    # Rows changed in place may have new names, and the header records the contents the scores were made from
+    write_header(path, plants['Species'], states, hashes=(row_hashes(plants), row_hashes(states)), tolerance=tolerance)
+    _write_rollups(path, state_counts, crop_counts)
+
+
+def _rebuild(plants, states, path, store, species, codes):
+    '''
+    This function rewrites the store for a new set of plants or states. Scores of plant and state pairs that are
+    in both the old and new store and have not changed are copied, and only new or changed rows and columns are
+    scored. The roll-ups are recounted from the new growth scores.
+    '''
+
+    # Positions of the kept plants and states in the old store, -1 where they must be scored
+    old_cols = np.array([store.species_index.get(name, -1) if name not in species else -1
+                         for name in plants['Species']])
+    old_rows = np.array([store.state_index.get(code, -1) if code not in codes else -1
+                         for code in states['State_Code']])
+    kept_cols, kept_rows = np.flatnonzero(old_cols >= 0), np.flatnonzero(old_rows >= 0)
+    new_cols, new_rows = np.flatnonzero(old_cols < 0), np.flatnonzero(old_rows < 0)
+
+    scores = np.zeros((len(SCORES), len(states), len(plants)), dtype=np.int8)
+    scores[:, kept_rows[:, None], kept_cols] = store.tensor[:, old_rows[kept_rows][:, None], old_cols[kept_cols]]
+    if len(new_cols):
+        scores[:, :, new_cols] = suitability_matrix(plants.iloc[new_cols], states, workers=1)
+    if len(new_rows):
+        scores[:, new_rows] = suitability_matrix(plants, states.iloc[new_rows], workers=1)
+
+    # Write the new store next to the old one and swap it in
+    tensor = create_store(path, plants['Species'], states)
+    tensor[:] = scores
+    tensor.flush()
+    del tensor
+    save_store(path, plants['Species'], states, hashes=(row_hashes(plants), row_hashes(states)),
+               tolerance=store.tolerance)
+    _write_rollups(path, class_counts(scores[GROWTH], 1), class_counts(scores[GROWTH], 0))
+
+
+
+if __name__ == '__main__':
+
+    # Initialize dataframes
+    plants = pd.read_csv('ecocrop_files/ecocrop_cleaned.csv', header=0)
+    states = pd.read_csv('processed_env_files/env_var.csv', header=0)
+
+    # Rescore whatever has changed since the last run
+    delta = update_store(plants, states)
+    if delta.get('full'):
+        print('store built from scratch')
+    else:
+        for key, rows in delta.items():
+            print('{}: {}'.format(key, len(rows)))
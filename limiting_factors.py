@@ -0,0 +1,98 @@
+#!/bin/env python
+"""
+Program: Limiting Factors
+Programmer: Steven Doyle
+Date: 05.31.2021
+
+This script counts the limiting factors of every state and every country in one pass over the suitability matrix.
+For each state it records how many plants each factor excludes, and how many plants are near misses: plants excluded
+by exactly one factor, counted under that factor, which would be grown if only that factor were met. Each country
+row adds up the counts of its states, so its counts are of plant and state pairs. The score store is used when it
+has been built for the same plants and states, otherwise the matrix is scored in chunks. Both levels are saved in a
+single table.
+
+inputs: 'ecocrop_cleaned.csv', 'env_var.csv', 'suitability_scores.npy' if built
+outputs: 'limiting_factors.csv'
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from crop_tables import CropTable, StateTable
+from cultivation_function import FACTORS, RESULT_COLS, suitability_matrix
+from score_store import open_store
+
+
+# Count columns of the table
+COUNT_COLS = (['States', 'Crops', 'Failing', 'Near_Miss'] + ['Excluded_' + f for f in FACTORS] +
+              ['Near_Miss_' + f for f in FACTORS])
+
+
+def factor_counts(tensor, chunk_size=256):
+    '''
+    This function reduces a (scores x states x crops) suitability matrix, with the factor layers in the order of
+    FACTORS, to counts per state. It returns a (states x factors) array of the plants each factor excludes, a
+    (states x factors) array of the plants excluded by that factor alone, and the number of plants excluded by any
+    factor in each state. The states are read in chunks, so the matrix may be memory-mapped.
+    '''
+
+    n_states = tensor.shape[1]
+    excluded = np.zeros((n_states, len(FACTORS)), dtype=np.int32)
+    near = np.zeros((n_states, len(FACTORS)), dtype=np.int32)
+    failing = np.zeros(n_states, dtype=np.int32)
+
+    for start in range(0, n_states, chunk_size):
+        stop = min(start + chunk_size, n_states)
+        zero = np.asarray(tensor[:len(FACTORS), start:stop]) == 0  # Factors x states x crops
+        n_zero = zero.sum(axis=0, dtype=np.int8)
+        excluded[start:stop] = zero.sum(axis=2).T
+        near[start:stop] = (zero & (n_zero == 1)).sum(axis=2).T
+        failing[start:stop] = (n_zero > 0).sum(axis=1)
+
+    return excluded, near, failing
+
+
+def limiting_factors(tensor, states, chunk_size=256):
+    '''
+    This function returns the limiting factor table: one row per state followed by one row per country, with the
+    'Level' column telling them apart and 'Code' and 'Name' holding the state or country code and name.
+    '''
+
+    excluded, near, failing = factor_counts(tensor, chunk_size)
+
+    counts = np.column_stack([np.ones(len(failing), dtype=np.int32),
+                              np.full(len(failing), tensor.shape[2], dtype=np.int32),
+                              failing, near.sum(axis=1), excluded, near])
+    statedf = pd.DataFrame(counts, columns=COUNT_COLS)
+    statedf.insert(0, 'Level', 'State')
+    statedf.insert(1, 'Code', states['State_Code'])
+    statedf.insert(2, 'Name', states['State_Name'])
+    statedf.insert(3, 'Country_Code', states['Country_Code'])
+
+    # Add up the states of each country
+    countries = pd.DataFrame({col: states[col] for col in RESULT_COLS[3:5]})
+    countrydf = statedf.groupby('Country_Code', sort=False)[COUNT_COLS].sum().reset_index()
+    countrydf = countrydf.merge(countries.drop_duplicates('Country_Code'), on='Country_Code')
+    countrydf.insert(0, 'Level', 'Country')
+    countrydf.insert(1, 'Code', countrydf['Country_Code'])
+    countrydf.insert(2, 'Name', countrydf.pop('Country_Name'))
+
+    return pd.concat([statedf, countrydf], ignore_index=True)
+
+
+
+if __name__ == '__main__':
+
+    # Initialize tables
+    plants = CropTable.read('ecocrop_files/ecocrop_cleaned.csv')
+    states = StateTable.read('processed_env_files/env_var.csv')
+
+    store = open_store('ecocrop_files/ecocrop_cleaned.csv', 'processed_env_files/env_var.csv')
+    if store is not None:
+        tensor = store.tensor
+    else:
+        tensor = suitability_matrix(plants, states)
+
+    resdf = limiting_factors(tensor, states)
+    resdf.to_csv('limiting_factors.csv', header=True, index=False)
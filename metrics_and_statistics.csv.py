@@ -7,59 +7,29 @@ Date: 04.29.2021
 This script produces descriptive statistics for the results of the cultivation function when specifying a single state
 as the location variable and all plants as the plant variable.
 
-inputs: '*_*_*_scores.csv'
+inputs: '*_*_*_scores.csv', or 'suitability_scores.npy' if it holds the scores of the current 'ecocrop_cleaned.csv'
+and 'env_var.csv'
 outputs: '*_pass_metrics.csv', 'Min_Rain_Diff.png', 'Max_Alt.png', '*_all_data.csv', '*_passing_data.csv',
 '*_failing_data.csv'
 
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
-
-def avg_std(df):
-    cols = ['Temp_Abs_Min (C)', 'Temp_Abs_Max (C)', 'Rain_Abs_Min (mm)', 'Rain_Abs_Max (mm)', 'Alt_Abs_Max (m)', 'pH_Abs_Min',
-            'pH_Abs_Max', 'Texture_Abs', 'Fertility_Abs', 'Cycle_Min (Days)', 'Cycle_Max (Days)']
-    resdf = pd.DataFrame(columns=cols)
-    mtmin = df['Temp_Abs_Min'].mean()
-    mtmax = df['Temp_Abs_Max'].mean()
-    mrmin = df['Rain_Abs_Min'].mean()
-    mrmax = df['Rain_Abs_Max'].mean()
-    mamax = df['Alt_Abs_Max'].mean()
-    mpmin = df['pH_Abs_Min'].mean()
-    mpmax = df['pH_Abs_Max'].mean()
-    mtabs = df['Texture_Abs'].mode()
-    mfabs = df['Fertility_Abs'].mode()
-    mcmin = df['Cycle_Min'].mean()
-    mcmax = df['Cycle_Max'].mean()
-
-    means = [mtmin,mtmax,mrmin,mrmax,mamax,mpmin,mpmax,mtabs,mfabs,mcmin,mcmax]
-    mres_ser = pd.Series(means, index=resdf.columns, name='Mean (Continuous), Mode (Categorical)')
-    resdf = resdf.append(mres_ser)
-
-    mtmin = df['Temp_Abs_Min'].std()
-    mtmax = df['Temp_Abs_Max'].std()
-    mrmin = df['Rain_Abs_Min'].std()
-    mrmax = df['Rain_Abs_Max'].std()
-    mamax = df['Alt_Abs_Max'].std()
-    mpmin = df['pH_Abs_Min'].std()
-    mpmax = df['pH_Abs_Max'].std()
-    mtabs = 'na'
-    mfabs = 'na'
-    mcmin = df['Cycle_Min'].std()
-    mcmax = df['Cycle_Max'].std()
-
-    stds = [mtmin, mtmax, mrmin, mrmax, mamax, mpmin, mpmax, mtabs, mfabs, mcmin, mcmax]
-    sres_ser = pd.Series(stds, index=resdf.columns, name='Standard Deviation')
-    resdf = resdf.append(sres_ser)
-    resdf.to_csv('morogoro_pass_metrics.csv', header=True, index=True)
-
-    return
+
+from passing_statistics import metrics_table, passing_statistics
+from report_figures import altitude_figure, rain_figure
+from score_store import open_store
+
 
 
 if __name__ == '__main__':
 
-    # Initialize scores df
-    scoredf = pd.read_csv('Morogoro_Region_Tanzania_scores.csv', header=0)
+    # Initialize scores df, sliced from the score store if it holds the current scores
+    store = open_store('ecocrop_files/ecocrop_cleaned.csv', 'processed_env_files/env_var.csv')
+    if store is not None:
+        scoredf = store.state('TZA.14_1')
+    else:
+        scoredf = pd.read_csv('Morogoro_Region_Tanzania_scores.csv', header=0)
     scoredf = scoredf.set_index('Species', drop=False)
 
     # Initialize plant list df
@@ -84,32 +54,12 @@ if __name__ == '__main__':
     fscore.to_csv('morogoro_failing_data.csv', header=True, index=False)
 
     # Get variable means and sds from passing plants
-    pscore = pd.read_csv('morogoro_passing_data.csv', header=0)
-    pscore = pscore.set_index('Species', drop=False)
-    avg_std(pscore)
+    statdf = passing_statistics(totaldf['Growth'].to_numpy()[None, :], totaldf, ['TZA.14_1'])
+    metrics_table(statdf, 'TZA.14_1').to_csv('morogoro_pass_metrics.csv', header=True, index=True)
 
 
     # Plot Rainfall Min
-    fig, ax = plt.subplots(dpi=96)
-    plt.rcParams['figure.figsize'] = (20, 15)
-    ax.boxplot([pscore['Rain_Abs_Min'],totaldf['Rain_Abs_Min']])
-    plt.title('Well-Suited Plants vs All Plants Minimum Rainfall (mm)')  # Title
-    plt.xlabel('Morogoro Plants Left, All Plants Right')  # X axis label
-    plt.ylabel('Precipitation (mm)')  # Y axis label
-    plt.rcParams['font.size'] = '28'
-    fig.savefig('Min_Rain_Diff.png')  # Save figure to file as image
-    plt.show()
+    rain_figure(pscore['Rain_Abs_Min'], totaldf['Rain_Abs_Min'], 'Morogoro').savefig('Min_Rain_Diff.png')
 
     # Plot histogram of altitude
-    fig = plt.figure(dpi=96)
-    plt.rcParams['figure.figsize'] = (20, 20)
-    plt.rcParams['font.size'] = '20'
-    plt.hist(pscore['Alt_Abs_Max'], bins=20)
-    plt.title('Distribution of Maximum Altitudes (m)')  # Title
-    plt.xlabel('Altitude (m)')  # X axis label
-    plt.ylabel('Number of Species')  # Y axis label
-    fig.savefig('Max_Alt.png')  # Save figure to file as image
-    plt.show()
-
-
-
+    altitude_figure(pscore['Alt_Abs_Max'], 'Morogoro').savefig('Max_Alt.png')
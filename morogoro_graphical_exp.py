@@ -6,73 +6,68 @@ Date: 04.29.2021
 
 This script conducts graphical analysis on the results of the cultivation function script. It analyzes the
 attributes most prohibitive for plant growth in the administrative region by recording the total numbers of
-plants excluded based on each attribute and conducting a principal component analysis on them.
+plants excluded based on each attribute and conducting a principal component analysis on them. The figures are
+matplotlib Figures drawn by the Agg renderer, so no pyplot state or global settings are changed.
 
-inputs: '*_all_data.csv', '*_passing_data.csv', '*_failing_data.csv'
-outputs: 'Fail_Bar.png', 'pca_fit.png', 'pca_scatter.png'
+inputs: '*_all_data.csv', '*_passing_data.csv', '*_failing_data.csv', or 'suitability_scores.npy' if it holds the
+scores of the current 'ecocrop_cleaned.csv' and 'env_var.csv'
+outputs: 'fail_bar.png', 'pca_fit.png', 'pca_scatter.png'
 
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
-import seaborn as sns; sns.set()
+from matplotlib.figure import Figure
 from sklearn.decomposition import PCA
 from sklearn.preprocessing import StandardScaler
 
+from cultivation_function import FACTORS
+from report_figures import fail_figure
+from score_store import open_store
 
 
-if __name__ == '__main__':
-
-    # Initialize total df
-    totaldf = pd.read_csv('morogoro_all_data.csv', header=0)
-    totaldf = totaldf.set_index('Species', drop=False)
 
-    # Initialize passing df
-    pscore = pd.read_csv('morogoro_passing_data.csv', header=0)
-    pscore = pscore.set_index('Species', drop=False)
+if __name__ == '__main__':
 
-    # Initialize failing df
-    fscore = pd.read_csv('morogoro_failing_data.csv', header=0)
-    fscore = fscore.set_index('Species', drop=False)
+    store = open_store('ecocrop_files/ecocrop_cleaned.csv', 'processed_env_files/env_var.csv')
+    if store is not None:
+        # Slice the state's scores from the score store if it holds the current scores and add the plant attributes
+        totaldf = store.state('TZA.14_1')
+        totaldf = totaldf.set_index('Species', drop=False)
+        plantdf = pd.read_csv('ecocrop_files/ecocrop_cleaned.csv', header=0, index_col='Species')
+        totaldf = totaldf.join(plantdf)
+        pscore = totaldf[totaldf['Growth'] != 0]
+        fscore = totaldf[totaldf['Growth'] == 0]
+
+    else:
+        # Initialize total df
+        totaldf = pd.read_csv('morogoro_all_data.csv', header=0)
+        totaldf = totaldf.set_index('Species', drop=False)
+
+        # Initialize passing df
+        pscore = pd.read_csv('morogoro_passing_data.csv', header=0)
+        pscore = pscore.set_index('Species', drop=False)
+
+        # Initialize failing df
+        fscore = pd.read_csv('morogoro_failing_data.csv', header=0)
+        fscore = fscore.set_index('Species', drop=False)
 
     # Count failing variables
-    alt = fscore[fscore['Alt'] == 0].shape[0]
-    rain = fscore[fscore['Rain'] == 0].shape[0]
-    ph = fscore[fscore['pH'] == 0].shape[0]
-    tmin = fscore[fscore['Temp_Min'] == 0].shape[0]
-    tmax = fscore[fscore['Temp_Max'] == 0].shape[0]
-    text = fscore[fscore['Texture'] == 0].shape[0]
-    fert = fscore[fscore['Fertility'] == 0].shape[0]
-    cycle = fscore[fscore['Cycle'] == 0].shape[0]
-    labels = ['Alt', 'Precip', 'pH', 'Min Temp', 'Max Temp',
-              'Texture', 'Fertility', 'Growing Period']
-    vars = [alt, rain, ph, tmin, tmax, text, fert, cycle]
-    fig = plt.figure(dpi=96)
-    plt.rcParams['figure.figsize'] = (20, 30)
-    plt.rcParams['font.size'] = '28'
-    plt.bar(labels, vars)
-    plt.title('Causes of Plant Growth Failure')  # Title
-    plt.xlabel('Variable')  # X axis label
-    plt.ylabel('Number of Occurrences')  # Y axis label
-    plt.xticks(labels, size=8)
-    fig.savefig('Fail_Bar.png')  # Save figure to file as image
-    plt.show()
+    counts = (fscore[FACTORS] == 0).sum().to_numpy()
+    fail_figure(counts, 'Morogoro').savefig('fail_bar.png')  # Save figure to file as image
 
     # PCA
     df = totaldf[['Temp_Abs_Min', 'Temp_Abs_Max', 'Rain_Abs_Min', 'Rain_Abs_Max', 'Alt_Abs_Max',
                  'pH_Abs_Min', 'pH_Abs_Max', 'Cycle_Min', 'Cycle_Max', 'Growth']].copy()
 
     pca = PCA().fit(df)
-    fig = plt.figure(dpi=96)
-    plt.rcParams['figure.figsize'] = (20, 15)
-    plt.rcParams['font.size'] = '28'
-    plt.plot(np.cumsum(pca.explained_variance_ratio_))
-    plt.xlabel('Number of Components')
-    plt.ylabel('Cumulative Explained Variance')
-    plt.title('Principal Component Fitting')  # Title
+    fig = Figure(figsize=(20, 15), dpi=96)
+    ax = fig.add_subplot()
+    ax.plot(np.cumsum(pca.explained_variance_ratio_))
+    ax.set_xlabel('Number of Components', fontsize=28)
+    ax.set_ylabel('Cumulative Explained Variance', fontsize=28)
+    ax.set_title('Principal Component Fitting', fontsize=28)  # Title
     fig.savefig('pca_fit.png')  # Save figure to file as image
-    plt.show()
 
 
     features = ['Temp_Abs_Min', 'Temp_Abs_Max', 'Rain_Abs_Min', 'Rain_Abs_Max', 'Alt_Abs_Max',
@@ -84,12 +79,12 @@ if __name__ == '__main__':
     pca = PCA(n_components=2)
     pca.fit(scaled_data)
     x_pca = pca.transform(scaled_data)
-    plt.figure()
+    fig = Figure()
+    ax = fig.add_subplot()
 
     targets = df['Growth'].values
-    plt.scatter(x_pca[:, 0], x_pca[:, 1], c=targets, cmap='rainbow')
-    plt.xlabel('First principal component')
-    plt.ylabel('Second Principal Component')
-    plt.title('Principal Component Analysis of Plant Variables')  # Title
-    plt.show()
-    plt.savefig('pca_scatter.png')
+    ax.scatter(x_pca[:, 0], x_pca[:, 1], c=targets, cmap='rainbow')
+    ax.set_xlabel('First principal component')
+    ax.set_ylabel('Second Principal Component')
+    ax.set_title('Principal Component Analysis of Plant Variables')  # Title
+    fig.savefig('pca_scatter.png')  # Save figure to file as image
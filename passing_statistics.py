@@ -0,0 +1,141 @@
+#!/bin/env python
+"""
+Program: Passing Statistics
+Programmer: Steven Doyle
+Date: 06.01.2021
+
+This script describes the plants that can be grown in every state at once. The growth scores of the suitability
+matrix are used as a mask over the plant attributes of 'ecocrop_cleaned.csv', so the mean and standard deviation of
+each numeric attribute and the most common class of each categorical attribute among a state's passing plants come
+from a few matrix products rather than from filtering a table per state. The result is one tidy table with a row per
+state and attribute. The 'metrics_table' function lays out the rows of one state like the '*_pass_metrics.csv' file of
+'metrics_and_statistics.csv.py', which uses it.
+
+inputs: 'ecocrop_cleaned.csv', 'env_var.csv', 'suitability_scores.npy' if built
+outputs: 'pass_statistics.csv'
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from crop_tables import CropTable, StateTable
+from cultivation_function import suitability_matrix
+from score_store import open_store
+
+
+# Attributes described, with the labels and units used in the pass metrics table
+NUMERIC_ATTRS = {'Temp_Abs_Min': 'Temp_Abs_Min (C)', 'Temp_Abs_Max': 'Temp_Abs_Max (C)',
+                 'Rain_Abs_Min': 'Rain_Abs_Min (mm)', 'Rain_Abs_Max': 'Rain_Abs_Max (mm)',
+                 'Alt_Abs_Max': 'Alt_Abs_Max (m)', 'pH_Abs_Min': 'pH_Abs_Min', 'pH_Abs_Max': 'pH_Abs_Max',
+                 'Cycle_Min': 'Cycle_Min (Days)', 'Cycle_Max': 'Cycle_Max (Days)'}
+CATEGORICAL_ATTRS = {'Texture_Abs': 'Texture_Abs', 'Fertility_Abs': 'Fertility_Abs'}
+
+# Order of the columns of the pass metrics table
+METRIC_ATTRS = ['Temp_Abs_Min', 'Temp_Abs_Max', 'Rain_Abs_Min', 'Rain_Abs_Max', 'Alt_Abs_Max', 'pH_Abs_Min',
+                'pH_Abs_Max', 'Texture_Abs', 'Fertility_Abs', 'Cycle_Min', 'Cycle_Max']
+
+
+def masked_moments(mask, values):
+    '''
+    This function returns the count, mean, and sample standard deviation of the columns of a (crops x attributes)
+    array over the crops selected by each row of a (states x crops) boolean mask. The values are centred on their
+    overall mean first so the sums of squares stay accurate.
+    '''
+
+    centre = values.mean(axis=0)
+    values = values - centre
+    weights = mask.astype(float)
+    count = weights.sum(axis=1)[:, None]
+    total = weights @ values
+    squares = weights @ values**2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(count > 0, total/count + centre, np.nan)
+        var = np.where(count > 1, (squares - total**2/count)/(count - 1), np.nan)
+
+    return count[:, 0].astype(np.int64), mean, np.sqrt(np.maximum(var, 0))
+
+
+def masked_modes(mask, labels):
+    '''
+    This function returns the most common label among the crops selected by each row of a (states x crops) boolean
+    mask, taking the first in sorted order on a tie like pandas, or a missing value where no crop is selected.
+    '''
+
+    classes, codes = np.unique(labels, return_inverse=True)
+    counts = mask.astype(np.int32) @ np.eye(len(classes), dtype=np.int32)[codes]
+    modes = classes[counts.argmax(axis=1)].astype(object)
+    modes[counts.max(axis=1) == 0] = np.nan
+
+    return modes
+
+
+def passing_statistics(growth, plants, codes, chunk_size=256):
+    '''
+    This function returns the tidy table of the passing plants of every state, with one row per state and attribute
+    holding the number of passing plants, the mean and standard deviation of numeric attributes, and the mode of
+    categorical ones. growth is the (states x crops) growth layer of the suitability matrix, which may be memory-
+    mapped, plants the plant dataframe in the order of its columns, and codes the state code of each row.
+    '''
+
+    numeric = plants[list(NUMERIC_ATTRS)].to_numpy(dtype=float)
+    labels = {col: plants[col].to_numpy(dtype=str) for col in CATEGORICAL_ATTRS}
+    num_pos = [METRIC_ATTRS.index(col) for col in NUMERIC_ATTRS]
+    n_attrs = len(METRIC_ATTRS)
+
+    tables = []
+    for start in range(0, len(codes), chunk_size):
+        mask = np.asarray(growth[start:start + chunk_size]) > 0
+        n = len(mask)
+        count, mean, std = masked_moments(mask, numeric)
+
+        # States x attributes blocks, with the attributes in the order of the pass metrics table
+        means, stds = np.full((n, n_attrs), np.nan), np.full((n, n_attrs), np.nan)
+        means[:, num_pos], stds[:, num_pos] = mean, std
+        modes = np.full((n, n_attrs), np.nan, dtype=object)
+        for col, values in labels.items():
+            modes[:, METRIC_ATTRS.index(col)] = masked_modes(mask, values)
+
+        tables.append(pd.DataFrame({'State_Code': np.repeat(np.asarray(codes[start:start + n]), n_attrs),
+                                    'Attribute': np.tile(METRIC_ATTRS, n), 'Passing': np.repeat(count, n_attrs),
+                                    'Mean': means.ravel(), 'Std': stds.ravel(), 'Mode': modes.ravel()}))
+
+    return pd.concat(tables, ignore_index=True)
+
+
+def metrics_table(statdf, code):
+    '''
+    This function lays out the rows of one state of the tidy table as the pass metrics table: a row of means, with
+    modes for the categorical attributes, and a row of standard deviations, with a column per attribute.
+    '''
+
+    rows = statdf[statdf['State_Code'] == code].set_index('Attribute').loc[METRIC_ATTRS]
+    labels = dict(NUMERIC_ATTRS, **CATEGORICAL_ATTRS)
+    numeric = ~rows.index.isin(list(CATEGORICAL_ATTRS))
+    means = rows['Mean'].where(numeric, rows['Mode'])
+    stds = rows['Std'].where(numeric, 'na')
+
+    resdf = pd.DataFrame([means.to_numpy(), stds.to_numpy()], columns=[labels[col] for col in METRIC_ATTRS],
+                         index=['Mean (Continuous), Mode (Categorical)', 'Standard Deviation'])
+
+    return resdf
+
+
+
+if __name__ == '__main__':
+
+    # Initialize tables
+    plants = CropTable.read('ecocrop_files/ecocrop_cleaned.csv')
+    states = StateTable.read('processed_env_files/env_var.csv')
+    plantdf = pd.read_csv('ecocrop_files/ecocrop_cleaned.csv', header=0)
+
+    # Growth layer from the score store if it matches, otherwise scored here
+    store = open_store('ecocrop_files/ecocrop_cleaned.csv', 'processed_env_files/env_var.csv')
+    if store is not None:
+        growth = store.layer('Growth')
+    else:
+        growth = suitability_matrix(plants, states)[-1]
+
+    statdf = passing_statistics(growth, plantdf, states['State_Code'])
+    statdf.to_csv('pass_statistics.csv', header=True, index=False)
@@ -0,0 +1,244 @@
+#!/bin/env python
+"""
+Program: Pipeline
+Programmer: Steven Doyle
+Date: 05.24.2021
+
+This script runs the whole crop selector chain described in the README from a single entry point. Each stage lists the
+files it reads and writes, which gives the order the stages run in. Before a stage runs, its input files and code are
+hashed, and the stage is skipped when the hash is the same as on its last successful run and its outputs exist. Stages
+that do not depend on each other, such as the ECOCrop cleaning and the environmental consolidation, run at the same
+time. The figures are drawn without opening windows.
+
+inputs: the raw join files, 'SU_Info.csv', 'cropbasics_scrape.csv'
+outputs: every file written by the stages, '.pipeline_state.json'
+
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+# File holding the input hash of each stage's last successful run
+STATE_FILE = '.pipeline_state.json'
+
+RAW = 'raw_env_var_csv/'
+ENV = 'processed_env_files/'
+ECO = 'ecocrop_files/'
+
+JOIN_FILES = ['diurnal', 'dry_seasons', 'el', 'precip', 'soils', 'wet_temp', 'growing_period']
+ENV_FILES = ['diurnal', 'dry_seasons', 'precip', 'el', 'growing_period', 'wet_temp']
+
+# Score store files, read by the stages below when the store holds the current scores
+STORE = ['suitability_scores.npy', 'suitability_scores.json']
+
+
+class Stage:
+    '''
+    This class describes one step of the chain: the script to run and the folder to run it in (or a function to call),
+    the files it reads and writes, and the code files whose changes should also rerun it. Optional inputs, such as
+    the score store, are read when they exist: they are hashed with the inputs but do not keep the stage from
+    running when missing. Paths are relative to the project folder.
+    '''
+
+    def __init__(self, name, inputs, outputs, script=None, cwd='.', args=(), code=(), func=None, optional=()):
+        self.name = name
+        self.inputs = list(inputs)
+        self.optional = list(optional)
+        self.outputs = list(outputs)
+        self.script = script
+        self.cwd = cwd
+        self.args = list(args)
+        self.code = ([os.path.join(cwd, script)] if script else []) + list(code)
+        self.func = func
+
+    def run(self):
+        '''
+        This function runs the stage and raises an error if it fails.
+        '''
+
+        if self.func is not None:
+            self.func()
+            return
+        env = dict(os.environ, MPLBACKEND='Agg')  # Draw figures to files only
+        subprocess.run([sys.executable, self.script] + self.args, cwd=self.cwd, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+
+
+def copy_soil():
+    '''
+    This function copies the processed soil file into the processed environmental files folder.
+    '''
+
+    shutil.copyfile(RAW + 'processed_soil.csv', ENV + 'processed_soil.csv')
+
+
+STAGES = [
+    Stage('join_clean', [RAW + '{}_join.csv'.format(f) for f in JOIN_FILES],
+          [RAW + 'checked_{}_join.csv'.format(f) for f in JOIN_FILES], 'join_clean.py', cwd=RAW),
+    Stage('soils_data_conversions', [RAW + 'checked_soils_join.csv', RAW + 'SU_Info.csv'],
+          [RAW + 'processed_soil.csv'], 'soils_data_conversions.py', cwd=RAW),
+    Stage('copy_soil', [RAW + 'processed_soil.csv'], [ENV + 'processed_soil.csv'], func=copy_soil),
+    Stage('env_data_conversions', [RAW + 'checked_{}_join.csv'.format(f) for f in ENV_FILES],
+          [ENV + 'processed_{}.csv'.format(f) for f in ENV_FILES], 'env_data_conversions.py', args=['--quiet']),
+    Stage('state_statistics', [RAW + 'checked_{}_join.csv'.format(f) for f in ENV_FILES],
+          [ENV + 'stats_{}.csv'.format(f) for f in ENV_FILES], 'state_statistics.py'),
+    Stage('env_variables_construction', [ENV + 'processed_{}.csv'.format(f) for f in ENV_FILES + ['soil']],
+          [ENV + 'env_var.csv', 'missing_values.txt'], 'env_variables_construction.py', code=['table_cache.py']),
+    Stage('ecocrop_quality', [ECO + 'cropbasics_scrape.csv'],
+          [ECO + 'ecocrop_cleaned.csv', ECO + 'ecocrop_dropped_values.txt', ECO + 'Temp_Opt_Rainfall_Comparison.png',
+           ECO + 'Max_Cycle_Comparison.png'], 'ecocrop_quality.py', cwd=ECO),
+    Stage('cultivation_function', [ECO + 'ecocrop_cleaned.csv', ENV + 'env_var.csv'],
+          ['Morogoro_Region_Tanzania_scores.csv'], 'cultivation_function.py', code=['crop_tables.py']),
+    Stage('metrics_and_statistics', ['Morogoro_Region_Tanzania_scores.csv', ECO + 'ecocrop_cleaned.csv',
+                                      ENV + 'env_var.csv'],
+          ['morogoro_pass_metrics.csv', 'morogoro_all_data.csv', 'morogoro_passing_data.csv',
+           'morogoro_failing_data.csv', 'Min_Rain_Diff.png', 'Max_Alt.png'], 'metrics_and_statistics.csv.py',
+          code=['passing_statistics.py', 'report_figures.py', 'score_store.py'], optional=STORE),
+    Stage('morogoro_graphical_exp', ['morogoro_all_data.csv', 'morogoro_passing_data.csv', 'morogoro_failing_data.csv',
+                                     ECO + 'ecocrop_cleaned.csv', ENV + 'env_var.csv'],
+          ['fail_bar.png', 'pca_fit.png', 'pca_scatter.png'], 'morogoro_graphical_exp.py',
+          code=['report_figures.py', 'score_store.py'], optional=STORE),
+    Stage('limiting_factors', [ECO + 'ecocrop_cleaned.csv', ENV + 'env_var.csv'], ['limiting_factors.csv'],
+          'limiting_factors.py', code=['cultivation_function.py', 'crop_tables.py', 'score_store.py'], optional=STORE),
+    Stage('passing_statistics', [ECO + 'ecocrop_cleaned.csv', ENV + 'env_var.csv'], ['pass_statistics.csv'],
+          'passing_statistics.py', code=['cultivation_function.py', 'crop_tables.py', 'score_store.py'],
+          optional=STORE),
+]
+
+
+def file_hash(path):
+    '''
+    This function returns the sha256 hash of a file's contents, read in blocks.
+    '''
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def stage_hash(stage):
+    '''
+    This function returns one hash over the contents of all input and code files of a stage.
+    '''
+
+    digest = hashlib.sha256()
+    for path in stage.inputs + stage.optional + stage.code:
+        digest.update(path.encode())
+        digest.update((file_hash(path) if os.path.exists(path) else 'missing').encode())
+
+    return digest.hexdigest()
+
+
+def dependencies(stages):
+    '''
+    This function returns the names of the stages each stage depends on, meaning the stages that write its inputs.
+    '''
+
+    writers = {path: stage.name for stage in stages for path in stage.outputs}
+
+    return {stage.name: {writers[path] for path in stage.inputs + stage.optional
+                         if path in writers and writers[path] != stage.name} for stage in stages}
+
+
+def check(stage, state, force):
+    '''
+    This function decides whether a stage must run. It returns the stage's input hash, or None with the reason the
+    stage is skipped. A stage with missing input files is skipped, which keeps its existing outputs when the raw files
+    it reads are not available.
+    '''
+
+    missing = [path for path in stage.inputs + stage.code if not os.path.exists(path)]
+    if missing:
+        return None, 'inputs not available ({}), keeping outputs'.format(', '.join(missing))
+
+    digest = stage_hash(stage)
+    outputs_exist = all(os.path.exists(path) for path in stage.outputs)
+    if not force and outputs_exist and state.get(stage.name) == digest:
+        return None, 'unchanged'
+
+    return digest, None
+
+
+def run_pipeline(stages=STAGES, selected=None, force=False, jobs=None, dry_run=False):
+    '''
+    This function runs the stages in dependency order, running independent stages in parallel with up to jobs at a
+    time, and skipping stages whose inputs have not changed. Only the selected stage names are considered if given.
+    It returns the status of each stage.
+    '''
+
+    if selected:
+        stages = [stage for stage in stages if stage.name in selected]
+    deps = dependencies(stages)
+    state = {}
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE) as f:
+            state = json.load(f)
+
+    status = {}
+    pending = {stage.name: stage for stage in stages}
+    running, digests = {}, {}
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        while pending or running:
+            # Start every stage whose dependencies have finished
+            for name in list(pending):
+                if any(dep in pending or dep in running.values() for dep in deps[name]):
+                    continue
+                stage = pending.pop(name)
+                if any(status[dep] in ('failed', 'blocked') for dep in deps[name]):
+                    status[name] = 'blocked'
+                    print('{:<28} blocked by a failed stage'.format(name))
+                    continue
+                digest, reason = check(stage, state, force)
+                if digest is None or dry_run:
+                    status[name] = 'skipped' if digest is None else 'would run'
+                    print('{:<28} {}'.format(name, reason or 'would run'))
+                    continue
+                print('{:<28} running'.format(name))
+                running[pool.submit(stage.run)] = name
+                digests[name] = digest
+
+            if not running:
+                continue
+
+            # Wait for a stage to finish and record the result
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    future.result()
+                except (subprocess.CalledProcessError, OSError) as error:
+                    status[name] = 'failed'
+                    print('{:<28} failed: {}'.format(name, error))
+                    continue
+                status[name] = 'ran'
+                state[name] = digests[name]
+                print('{:<28} done'.format(name))
+                with open(STATE_FILE, 'w') as f:
+                    json.dump(state, f, indent=1)
+
+    return status
+
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Run the crop selector pipeline, skipping unchanged stages.')
+    parser.add_argument('stages', nargs='*', help='only consider these stages')
+    parser.add_argument('--force', action='store_true', help='run stages even if their inputs are unchanged')
+    parser.add_argument('--jobs', type=int, default=None, help='number of stages to run at once')
+    parser.add_argument('--dry-run', action='store_true', help='only report which stages would run')
+    args = parser.parse_args()
+
+    status = run_pipeline(selected=args.stages, force=args.force, jobs=args.jobs, dry_run=args.dry_run)
+    if 'failed' in status.values():
+        sys.exit(1)
@@ -49,7 +49,7 @@ if __name__ == '__main__':
     plt.ylabel('Probability Density')  # Y axis label
 
     fig.savefig('rainfall_changes_prob.png')  # Save figure to file as image
-    plt.show()
+    plt.close(fig)
 
 
 
@@ -64,7 +64,7 @@ if __name__ == '__main__':
     plt.ylabel('Records')  # Y axis label
     
     fig.savefig('temp_diff.png')  # Save figure to file as image
-    plt.show()
+    plt.close(fig)
 
 
     #Plot temp vs alt
@@ -74,7 +74,7 @@ if __name__ == '__main__':
     plt.xlabel('Optimum Minimum Temperature (Degrees Celsius)')
     plt.ylabel('Maximum Altitude (Meters)')
     fig.savefig('Minimum_Temp_vs_Altitude.png')
-    plt.show()
+    plt.close(fig)
 
     
 
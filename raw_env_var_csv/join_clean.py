@@ -12,8 +12,19 @@ outputs: 'checked_*_join.csv'
 
 """
 
+import argparse
+from collections import defaultdict
+
+import numpy as np
 import pandas as pd
 
+
+# Columns of the ArcGIS join files that are not needed
+DROP_COLS = ['OID_', 'TARGET_FID', 'pointid', 'VARNAME_1', 'NL_NAME_1', 'TYPE_1', 'CC_1', 'HASC_1']
+
+# Numeric columns of the join files, any other kept column (such as FAOSOIL) is read as text when streaming
+NUMERIC_COLS = ['Join_Count', 'grid_code']
+
 def ReadData( fileName ):
     """This function takes a filename as input, and returns a dataframe with
     raw data read from that file in a Pandas DataFrame. It uses the columns:
@@ -31,8 +42,7 @@ def ReadData( fileName ):
 
     # open and read the file
     DataDF = pd.read_csv(fileName,header=0)
-    DataDF = DataDF.drop(['OID_', 'TARGET_FID', 'pointid', 'VARNAME_1', 'NL_NAME_1',
-                          'TYPE_1', 'CC_1', 'HASC_1'], axis=1)
+    DataDF = DataDF.drop(DROP_COLS, axis=1)
      
     return( DataDF)
 
@@ -50,30 +60,60 @@ def RemoveNoDataValues( DataDF):
     return( DataDF)
 
 
+def StreamTypes( fileName, chunkSize=100000 ):
+    """This function reads only the numeric columns of the file in chunks and
+    returns the types pandas gives them when it reads the whole file at once, so
+    the streamed output writes its values the same way as ReadData does."""
+
+    dtypes = {}
+    for chunk in pd.read_csv(fileName, header=0, usecols=NUMERIC_COLS, chunksize=chunkSize):
+        for col in NUMERIC_COLS:
+            dtypes[col] = np.result_type(dtypes.get(col, chunk[col].dtype), chunk[col].dtype)
+
+    return( defaultdict(lambda: str, dtypes) )
+
+
+def StreamClean( fileName, outName, chunkSize=100000 ):
+    """This function is the streaming version of ReadData and RemoveNoDataValues.
+    It reads only the kept columns of the file, with explicit types, in chunks of
+    chunkSize rows, filters each chunk, and appends it to the output file, so the
+    memory used does not grow with the size of the file. The numeric columns
+    are given the types found by StreamTypes, so the output file is the same as
+    the one written without streaming. It returns the number of rows kept and
+    dropped."""
+
+    kept = 0
+    dropped = 0
+    reader = pd.read_csv(fileName, header=0, usecols=lambda col: col not in DROP_COLS,
+                         dtype=StreamTypes(fileName, chunkSize), chunksize=chunkSize)
+    for i, chunk in enumerate(reader):
+        checked = RemoveNoDataValues(chunk)
+        checked.to_csv(outName, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        kept += len(checked)
+        dropped += len(chunk) - len(checked)
+
+    return( kept, dropped )
+
+
 
 if __name__ == '__main__':
 
+    parser = argparse.ArgumentParser(description='Remove unjoined points from the ArcGIS join files.')
+    parser.add_argument('--stream', action='store_true', help='read and write the files in chunks')
+    parser.add_argument('--chunksize', type=int, default=100000, help='rows per chunk when streaming')
+    args = parser.parse_args()
+
     fileList = ['diurnal_join.csv', 'dry_seasons_join.csv', 'el_join.csv', 'precip_join.csv', 'soils_join.csv',
                 'wet_temp_join.csv', 'growing_period_join.csv']
 
     for file in fileList:
         fileName = file
+        if args.stream:
+            kept, dropped = StreamClean(fileName, 'checked_{}'.format(file), args.chunksize)
+            print('{} checked: {} rows kept, {} rows dropped'.format(file, kept, dropped))
+            continue
         DataDF = ReadData(fileName)
+        RawRows = len(DataDF)
         DataDF = RemoveNoDataValues(DataDF)
-        print('{} checked'.format(file))
+        print('{} checked: {} rows kept, {} rows dropped'.format(file, len(DataDF), RawRows - len(DataDF)))
         DataDF.to_csv('checked_{}'.format(file), header=True, index=False)
-
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
\ No newline at end of file
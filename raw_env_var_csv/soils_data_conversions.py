@@ -38,45 +38,42 @@ def process_join(soil_join):
     """
     This function takes the soils join dataframe, conducts a quality check converting any
     incorrect soil codes to their correct versions, dropping irrelevant columns, and returning the df.
+    Each distinct soil code is only normalized once and the result is spread back to the rows.
     """
 
-    soil_join['FAOSOIL'] = soil_join['FAOSOIL'].replace(['WAT', 'WATER', 'SALT', 'D/SS', 'ROCK'],
-                                                        ['WR', 'WR', 'SA', 'DS', 'RK'])  # Fixing discrepancies in soil codes
+    codes, uniques = pd.factorize(soil_join['FAOSOIL'])  # Integer code of each row's distinct soil name
 
-    soil_join = soil_join.drop('grid_code', axis=1)  # Dropping unneeded column
+    soil_names = pd.Series(uniques).replace(['WAT', 'WATER', 'SALT', 'D/SS', 'ROCK'],
+                                            ['WR', 'WR', 'SA', 'DS', 'RK'])  # Fixing discrepancies in soil codes
 
-    soil_join['Soil_Code'] = soil_join['FAOSOIL'].str.slice(0,2)  # Trim extra characters
+    soil_names = soil_names.str.slice(0,2)  # Trim extra characters
 
-    soil_join['Soil_Code'] = soil_join['Soil_Code'].str.replace('[^a-zA-Z]', '', regex=True)  # Cut all non alphabetical
+    soil_names = soil_names.str.replace('[^a-zA-Z]', '', regex=True)  # Cut all non alphabetical
 
-    soil_join['Soil_Code'] = soil_join['Soil_Code'].str.upper()  # Convert to uppercase
+    soil_names = soil_names.str.upper()  # Convert to uppercase
 
-    soil_join = soil_join.drop('FAOSOIL', axis=1)  # Dropping unneeded column
+    soil_join = soil_join.drop(['grid_code', 'FAOSOIL'], axis=1)  # Dropping unneeded columns
+
+    soil_join['Soil_Code'] = soil_names.take(codes.clip(0)).where(codes >= 0).to_numpy()  # Missing names stay na
 
     return  soil_join
 
 
 def merge_soils(soil_join, soil_ref):
     """
-    This function takes the soils join dataframe and the soil ref dataframe and maps the soil ref
-    attributes and returns a dataframe where the soil code is replaced by the soil variables.
+    This function takes the soils join dataframe and the soil ref dataframe and joins the soil ref
+    attributes in a single merge on the soil code. It returns a dataframe where the soil code is
+    replaced by the soil variables.
     """
 
-    # Convert soil_ref attribute columns to dictionaries with the soil code as key and attribute as value
-    soil_ref.set_index('type', inplace=True)  # Convert soil type to index to become the dict key
-    sand_dict = soil_ref['sand % topsoil'].to_dict()  # Convert each column to dict
-    silt_dict = soil_ref['silt % topsoil'].to_dict()
-    clay_dict = soil_ref['clay % topsoil'].to_dict()
-    oc_dict = soil_ref['OC % topsoil'].to_dict()
-    cn_dict = soil_ref['C/N topsoil'].to_dict()
-    ph_dict = soil_ref['pH water topsoil'].to_dict()
-
-    soil_join['Sand'] = soil_join['Soil_Code'].map(sand_dict)  # Map each column using the index and the soil code
-    soil_join['Silt'] = soil_join['Soil_Code'].map(silt_dict)
-    soil_join['Clay'] = soil_join['Soil_Code'].map(clay_dict)
-    soil_join['OC'] = soil_join['Soil_Code'].map(oc_dict)
-    soil_join['CN'] = soil_join['Soil_Code'].map(cn_dict)
-    soil_join['pH'] = soil_join['Soil_Code'].map(ph_dict)
+    # Rename the soil_ref attribute columns to the variable names and use the soil code as the key
+    attrs = soil_ref.set_index('type')
+    attrs = attrs.rename(columns={'sand % topsoil': 'Sand', 'silt % topsoil': 'Silt', 'clay % topsoil': 'Clay',
+                                  'OC % topsoil': 'OC', 'C/N topsoil': 'CN', 'pH water topsoil': 'pH'})
+    attrs = attrs[['Sand', 'Silt', 'Clay', 'OC', 'CN', 'pH']]
+    attrs = attrs[~attrs.index.duplicated(keep='last')]  # One row per soil code
+
+    soil_join = soil_join.merge(attrs, how='left', left_on='Soil_Code', right_index=True)
 
     soil_join = soil_join.drop('Soil_Code', axis=1)  # Drop the soil code because it is no longer needed
 
@@ -85,30 +82,18 @@ def merge_soils(soil_join, soil_ref):
 
 def consolidate(soil_df):
     """
-    This function takes the soil df dataframe, creates a new dataframe out of the subnational jurisdiction
-    code unique values, and takes the average of each attribute for each jurisdiction value. It maps them
-    and returns a consolidated dataframe with average soil attribute values for each location.
+    This function takes the soil df dataframe and takes the average of each soil attribute for each
+    subnational jurisdiction in a single grouped pass. It returns a consolidated dataframe with one row
+    per jurisdiction, in the order they first appear, with average soil attribute values for each location.
     """
 
-    # Create new df from unique subnational values
-
-    datadf = pd.DataFrame(0, index = soil_df['GID_1'].unique(), columns=soil_df.columns)
-
-
-    # Create means for each variable
-    for name in datadf.index:  # Loop through each unique subnational name
-        g0 = soil_df.loc[soil_df['GID_1'] == name, 'GID_0'].to_list()[0]  # All these values will be the same
-        n0 = soil_df.loc[soil_df['GID_1'] == name, 'NAME_0'].to_list()[0]
-        g1 = soil_df.loc[soil_df['GID_1'] == name, 'GID_1'].to_list()[0]
-        n1 = soil_df.loc[soil_df['GID_1'] == name, 'NAME_1'].to_list()[0]
-        en = soil_df.loc[soil_df['GID_1'] == name, 'ENGTYPE_1'].to_list()[0]
-        sa = soil_df.loc[soil_df['GID_1'] == name, 'Sand'].mean()  # Use mean for float columns
-        si = soil_df.loc[soil_df['GID_1'] == name, 'Silt'].mean()
-        cl = soil_df.loc[soil_df['GID_1'] == name, 'Clay'].mean()
-        oc = soil_df.loc[soil_df['GID_1'] == name, 'OC'].mean()
-        cn = soil_df.loc[soil_df['GID_1'] == name, 'CN'].mean()
-        ph = soil_df.loc[soil_df['GID_1'] == name, 'pH'].mean()
-        datadf.loc[name] = [g0, n0, g1, n1, en, sa, si, cl, oc, cn, ph]
+    # Names and codes are the same for every row of a jurisdiction, so take them from its first row
+    datadf = soil_df.drop_duplicates('GID_1').set_index('GID_1', drop=False)
+    datadf.index.name = None
+
+    # Create means for each variable in one pass
+    soil_cols = ['Sand', 'Silt', 'Clay', 'OC', 'CN', 'pH']
+    datadf[soil_cols] = soil_df.groupby('GID_1', sort=False)[soil_cols].mean()
 
     datadf = datadf.fillna(0)
 
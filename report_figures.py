@@ -0,0 +1,216 @@
+#!/bin/env python
+"""
+Program: Report Figures
+Programmer: Steven Doyle
+Date: 06.02.2021
+
+This script draws the state figures of 'metrics_and_statistics.csv.py' and 'morogoro_graphical_exp.py' for any list
+of states: the minimum rainfall of the passing plants against all plants ('Min_Rain_Diff'), the maximum altitudes of
+the passing plants ('Max_Alt'), and the number of plants each factor excludes ('Fail_Bar'). The suitability matrix,
+from the score store when it has been built, is first reduced once to what the figures need: how many passing plants
+have each distinct minimum rainfall and maximum altitude, and the exclusion counts of each factor. The figures are
+then drawn to png files by worker processes without opening windows. Each figure is its own matplotlib Figure drawn
+by the Agg renderer, so no pyplot state or global settings are changed.
+
+inputs: 'ecocrop_cleaned.csv', 'env_var.csv', 'suitability_scores.npy' if built
+outputs: '<state code>_Min_Rain_Diff.png', '<state code>_Max_Alt.png', '<state code>_Fail_Bar.png'
+
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from crop_tables import CropTable, StateTable
+from cultivation_function import select_states, suitability_matrix
+from limiting_factors import factor_counts
+from score_store import open_store
+
+
+# Bar labels of the factors, in the order of FACTORS
+FAIL_LABELS = ['Alt', 'Precip', 'pH', 'Min Temp', 'Max Temp', 'Texture', 'Fertility', 'Growing Period']
+
+# Figures drawn for each state
+FIGURES = ['Min_Rain_Diff', 'Max_Alt', 'Fail_Bar']
+
+# Size of every figure in inches and its resolution
+FIG_SIZE = (10, 7.5)
+DPI = 96
+
+
+def rain_figure(passing, all_plants, name):
+    '''
+    This function returns the box plot figure of the minimum rainfall of a state's passing plants next to that of
+    all plants.
+    '''
+
+    fig = Figure(figsize=FIG_SIZE, dpi=DPI)
+    ax = fig.add_subplot()
+    ax.boxplot([passing, all_plants])
+    ax.set_title('Well-Suited Plants vs All Plants Minimum Rainfall (mm)', fontsize=16)
+    ax.set_xlabel('{} Plants Left, All Plants Right'.format(name), fontsize=14)
+    ax.set_ylabel('Precipitation (mm)', fontsize=14)
+
+    return fig
+
+
+def altitude_figure(passing, name):
+    '''
+    This function returns the histogram figure of the maximum altitudes of a state's passing plants.
+    '''
+
+    fig = Figure(figsize=FIG_SIZE, dpi=DPI)
+    ax = fig.add_subplot()
+    ax.hist(passing, bins=20)
+    ax.set_title('Distribution of Maximum Altitudes (m), {}'.format(name), fontsize=16)
+    ax.set_xlabel('Altitude (m)', fontsize=14)
+    ax.set_ylabel('Number of Species', fontsize=14)
+
+    return fig
+
+
+def fail_figure(counts, name):
+    '''
+    This function returns the bar figure of the number of plants each factor excludes in a state.
+    '''
+
+    fig = Figure(figsize=FIG_SIZE, dpi=DPI)
+    ax = fig.add_subplot()
+    ax.bar(FAIL_LABELS, counts)
+    ax.set_title('Causes of Plant Growth Failure, {}'.format(name), fontsize=16)
+    ax.set_xlabel('Variable', fontsize=14)
+    ax.set_ylabel('Number of Occurrences', fontsize=14)
+    ax.tick_params(axis='x', labelsize=8)
+
+    return fig
+
+
+def _value_counts(mask, values):
+    '''
+    This function returns the distinct values of a plant column and a (states x values) array of how many plants
+    selected by each row of a (states x crops) boolean mask have each value.
+    '''
+
+    distinct, codes = np.unique(values, return_inverse=True)
+
+    return distinct, (mask.astype(np.int32) @ np.eye(len(distinct), dtype=np.int32)[codes]).astype(np.int16)
+
+
+def figure_aggregates(tensor, plants, chunk_size=256):
+    '''
+    This function reduces a (scores x states x crops) suitability matrix, which may be memory-mapped, to what the
+    state figures need. The passing plants of a state are kept as counts of each distinct minimum rainfall and
+    maximum altitude, which give the same box plot and histogram as the plant values themselves.
+    '''
+
+    rain = np.asarray(plants['Rain_Abs_Min'], dtype=float)
+    alt = np.asarray(plants['Alt_Abs_Max'], dtype=float)
+    rain_values, alt_values = np.unique(rain), np.unique(alt)
+
+    rain_counts = np.zeros((tensor.shape[1], len(rain_values)), dtype=np.int16)
+    alt_counts = np.zeros((tensor.shape[1], len(alt_values)), dtype=np.int16)
+    for start in range(0, tensor.shape[1], chunk_size):
+        mask = np.asarray(tensor[-1, start:start + chunk_size]) > 0  # Growth layer
+        rain_counts[start:start + chunk_size] = _value_counts(mask, rain)[1]
+        alt_counts[start:start + chunk_size] = _value_counts(mask, alt)[1]
+
+    return {'all_rain': rain, 'rain_values': rain_values, 'rain_counts': rain_counts,
+            'alt_values': alt_values, 'alt_counts': alt_counts, 'excluded': factor_counts(tensor, chunk_size)[0]}
+
+
+def render_states(aggregates, rows, codes, names, folder='.'):
+    '''
+    This function draws the figures of the states in the given rows of the aggregates and saves them in folder as
+    '<state code>_<figure>.png'. It returns the number of files written.
+    '''
+
+    for i, code, name in zip(rows, codes, names):
+        rain = np.repeat(aggregates['rain_values'], aggregates['rain_counts'][i])
+        alt = np.repeat(aggregates['alt_values'], aggregates['alt_counts'][i])
+        figures = [rain_figure(rain, aggregates['all_rain'], name), altitude_figure(alt, name),
+                   fail_figure(aggregates['excluded'][i], name)]
+        for label, fig in zip(FIGURES, figures):
+            fig.savefig(os.path.join(folder, '{}_{}.png'.format(code, label)))
+
+    return len(FIGURES)*len(rows)
+
+
+# Figure aggregates of a worker process, set by _init_worker()
+_worker_aggregates = None
+
+
+def _init_worker(aggregates):
+    '''
+    This function keeps the figure aggregates in each worker process so they are sent once per worker.
+    '''
+
+    global _worker_aggregates
+    _worker_aggregates = aggregates
+
+
+def _render_chunk(rows, codes, names, folder):
+    '''
+    This function draws the figures of one group of states in a worker process.
+    '''
+
+    return render_states(_worker_aggregates, rows, codes, names, folder)
+
+
+def render_report(aggregates, codes, names, folder='.', chunk_size=16, workers=None):
+    '''
+    This function draws the figures of every state in the aggregates, spreading groups of chunk_size states over
+    worker processes (all cores by default, or in this process if workers is 1). It returns the number of files
+    written.
+    '''
+
+    codes, names = list(codes), list(names)
+    starts = range(0, len(codes), chunk_size)
+    workers = min(workers or os.cpu_count() or 1, len(starts))
+
+    if workers <= 1:
+        return render_states(aggregates, range(len(codes)), codes, names, folder)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(aggregates,)) as pool:
+        futures = [pool.submit(_render_chunk, range(start, min(start + chunk_size, len(codes))),
+                               codes[start:start + chunk_size], names[start:start + chunk_size], folder)
+                   for start in starts]
+
+        return sum(future.result() for future in futures)
+
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Draw the state figures of a list of states to png files.')
+    parser.add_argument('states', nargs='*', help='state codes (GID_1), TZA.14_1 if nothing is chosen')
+    parser.add_argument('--country', nargs='+', default=[], help='draw every state of these country codes (GID_0)')
+    parser.add_argument('--all', action='store_true', help='draw every state')
+    parser.add_argument('--folder', default='figures', help='folder for the figures')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, all cores by default')
+    args = parser.parse_args()
+
+    # Initialize tables
+    plants = CropTable.read('ecocrop_files/ecocrop_cleaned.csv')
+    states = StateTable.read('processed_env_files/env_var.csv')
+
+    # Choose states
+    try:
+        rows = select_states(states, args.states, args.country, args.all)
+    except ValueError as error:
+        parser.error(str(error))
+
+    # Scores of the chosen states, from the score store if it matches, otherwise scored here
+    store = open_store('ecocrop_files/ecocrop_cleaned.csv', 'processed_env_files/env_var.csv')
+    if store is not None:
+        tensor = store.tensor[:, rows]
+    else:
+        tensor = suitability_matrix(plants, states[rows])
+
+    aggregates = figure_aggregates(tensor, plants)
+    os.makedirs(args.folder, exist_ok=True)
+    written = render_report(aggregates, states['State_Code'][rows], states['State_Name'][rows], args.folder,
+                            workers=args.workers)
+    print('{} figures written'.format(written))
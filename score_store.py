@@ -0,0 +1,192 @@
+#!/bin/env python
+"""
+Program: Score Store
+Programmer: Steven Doyle
+Date: 05.12.2021
+
+This script scores every plant against every state and saves the suitability matrix once as a memory-mapped int8
+tensor of shape (factors, states, plants), together with a small json header listing the factor names, the
+species of each plant column, the code and names of each state row, and the content hash of every plant and state
+row. Other scripts open the store without copying it and slice out a single state or a single plant, and only use it
+while the hashes match the current csv files.
+
+inputs: 'ecocrop_cleaned.csv', 'env_var.csv'
+outputs: 'suitability_scores.npy', 'suitability_scores.json'
+
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+from crop_tables import CropTable, StateTable
+from cultivation_function import RESULT_COLS, SCORES, suitability_matrix
+
+
+# Default location of the store, without the file extension
+STORE_PATH = 'suitability_scores'
+
+# State columns kept in the header
+STATE_COLS = RESULT_COLS[:5]
+
+
+def row_hashes(df):
+    '''
+    This function returns a content hash for every row of a dataframe as a list of strings.
+    '''
+
+    return [str(h) for h in pd.util.hash_pandas_object(df, index=False)]
+
+
+def write_header(path, species, states, factors=SCORES, hashes=None, tolerance=None):
+    '''
+    This function writes the json header of a store: the factor names, the species of each plant column, the codes
+    and names of each state row, the content hashes of the plant and state rows the scores were made from, given as
+    a pair of lists, and the tolerance used to group states if the scores are approximate. The header is written to
+    a temporary file first and swapped in, so a reader never sees a partly written header.
+    '''
+
+    header = {'factors': list(factors),
+              'species': [str(name) for name in species],
+              'states': {col: [str(val) for val in states[col]] for col in STATE_COLS},
+              'hashes': None if hashes is None else {'species': list(hashes[0]), 'states': list(hashes[1])},
+              'tolerance': tolerance or None}
+    with open(path + '.json.tmp', 'w') as f:
+        json.dump(header, f)
+    os.replace(path + '.json.tmp', path + '.json')
+
+
+def create_store(path, species, states, factors=SCORES):
+    '''
+    This function returns the empty memory-mapped tensor for a new store, ready to be filled in by
+    suitability_matrix(). The tensor is written under a temporary name until save_store() swaps it in.
+    '''
+
+    return open_memmap(path + '.tmp.npy', mode='w+', dtype=np.int8, shape=(len(factors), len(states), len(species)))
+
+
+def save_store(path, species, states, factors=SCORES, hashes=None, tolerance=None):
+    '''
+    This function swaps a tensor filled in after create_store() in as the store and writes its header last, so a
+    store whose scoring was interrupted never matches the csv files. The tensor must be flushed and closed first.
+    '''
+
+    if os.path.exists(path + '.json'):
+        os.remove(path + '.json')  # The old header must not describe the new tensor
+    os.replace(path + '.tmp.npy', path + '.npy')
+    write_header(path, species, states, factors, hashes, tolerance)
+
+
+class ScoreStore:
+    '''
+    This class opens a saved store read only. The tensor is memory-mapped, so slicing a state or a plant only
+    reads that part of the file.
+    '''
+
+    def __init__(self, path=STORE_PATH):
+        with open(path + '.json') as f:
+            header = json.load(f)
+        self.factors = header['factors']
+        self.species = header['species']
+        self.hashes = header.get('hashes')  # Missing in stores built before the hashes were kept
+        self.tolerance = header.get('tolerance')
+        self.states = pd.DataFrame(header['states'])
+        self.tensor = np.load(path + '.npy', mmap_mode='r')
+
+        self.species_index = {name: i for i, name in enumerate(self.species)}  # Row and column lookups
+        self.state_index = {code: i for i, code in enumerate(self.states['State_Code'])}
+
+    def matches(self, plants, states, approximate=False):
+        '''
+        This function returns whether the store holds the current scores of the given plant and state dataframes,
+        as read from their csv files: every score layer, the same plants and states in the same order, and the same
+        row contents. Stores built with a tolerance only match if approximate is True, and stores that do not record
+        the row contents never match.
+        '''
+
+        if self.hashes is None or (self.tolerance and not approximate):
+            return False
+
+        return (self.factors == SCORES and self.species == list(plants['Species']) and
+                self.states['State_Code'].tolist() == list(states['State_Code']) and
+                self.hashes['species'] == row_hashes(plants) and self.hashes['states'] == row_hashes(states))
+
+    def layer(self, factor):
+        '''
+        This function returns the states x plants scores for a single factor.
+        '''
+
+        return self.tensor[self.factors.index(factor)]
+
+    def state(self, code):
+        '''
+        This function returns the score table of a single state, in the same layout as the '*_*_*_scores.csv'
+        files written by cultivation_function.py.
+        '''
+
+        i = self.state_index[code]
+        resdf = pd.DataFrame({col: self.states[col].iloc[i] for col in STATE_COLS}, index=range(len(self.species)))
+        resdf['Species'] = self.species
+        for k, factor in enumerate(self.factors):
+            resdf[factor] = np.asarray(self.tensor[k, i])
+
+        return resdf
+
+    def crop(self, species):
+        '''
+        This function returns the scores of a single plant against every state.
+        '''
+
+        j = self.species_index[species]
+        resdf = self.states.copy()
+        resdf['Species'] = species
+        for k, factor in enumerate(self.factors):
+            resdf[factor] = np.asarray(self.tensor[k, :, j])
+
+        return resdf
+
+
+def open_store(plant_file, state_file, path=STORE_PATH, approximate=False):
+    '''
+    This function opens the store if it has been built and holds the current scores of the plant and state csv
+    files, and otherwise returns None so the caller scores them itself.
+    '''
+
+    if not os.path.exists(path + '.npy') or not os.path.exists(path + '.json'):
+        return None
+    store = ScoreStore(path)
+    if not store.matches(pd.read_csv(plant_file, header=0), pd.read_csv(state_file, header=0), approximate):
+        return None
+
+    return store
+
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Score every plant against every state into the score store.')
+    parser.add_argument('--dedupe', action='store_true', help='score each class of equivalent states once')
+    parser.add_argument('--tolerance', nargs='+', default=[], metavar='COL=STEP',
+                        help='with --dedupe, round these state columns to multiples of a step first, e.g. Alt=50 '
+                             'pH=0.1 (approximate)')
+    args = parser.parse_args()
+    tolerance = {col: float(step) for col, step in (item.split('=') for item in args.tolerance)}
+    tolerance = tolerance if args.dedupe else None  # Only used to group states
+
+    # Initialize tables, and hash the csv rows the scores are made from
+    plants = CropTable.read('ecocrop_files/ecocrop_cleaned.csv')
+    states = StateTable.read('processed_env_files/env_var.csv')
+    hashes = (row_hashes(pd.read_csv('ecocrop_files/ecocrop_cleaned.csv', header=0)),
+              row_hashes(pd.read_csv('processed_env_files/env_var.csv', header=0)))
+
+    # Score everything straight into the memory-mapped file, and only then swap it in with its header
+    tensor = create_store(STORE_PATH, plants['Species'], states)
+    suitability_matrix(plants, states, out=tensor, dedupe=args.dedupe, tolerance=tolerance)
+    tensor.flush()
+    del tensor
+    save_store(STORE_PATH, plants['Species'], states, hashes=hashes, tolerance=tolerance)
+    print('{} plants x {} states x {} factors saved'.format(len(plants), len(states), len(SCORES)))
@@ -0,0 +1,228 @@
+#!/bin/env python
+"""
+Program: Scoring Service
+Programmer: Steven Doyle
+Date: 05.28.2021
+
+This script runs the crop selector as a local web service, so it can be asked what grows in a state or where a plant
+grows without reloading the tables for every question. The plant and state tables, and the score store when it has
+been built for the same plants and states, are loaded once and kept in memory. Answers are json and the most recent
+ones are kept in a least recently used cache, with the number of cache hits and misses reported by '/metrics'.
+
+GET  /state/<state code>    plants that can be grown in a state, with their factor and growth scores
+GET  /crop/<species>        states where a plant can be grown, with their factor and growth scores
+POST /states                {"codes": [...]} answers /state for each code
+POST /crops                 {"species": [...]} answers /crop for each species
+GET  /metrics               cache hits, misses, and size, and the number of requests
+
+Add '?min_growth=0' to a GET request, or "min_growth": 0 to a POST body, to also list the pairs that cannot be
+grown. The default is 1.
+
+inputs: 'ecocrop_cleaned.csv', 'env_var.csv', 'suitability_scores.npy' if built
+outputs: none
+
+"""
+
+import argparse
+import json
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import numpy as np
+
+from crop_tables import CropTable, StateTable
+from cultivation_function import RESULT_COLS, SCORES, factor_scores
+from score_store import open_store
+
+
+class ScoringService:
+    '''
+    This class keeps the plant and state tables, and the score store if it matches them, in memory and answers
+    state and plant questions from them. Answers are cached by state code or species and minimum growth score.
+    '''
+
+    def __init__(self, plants, states, store=None, cache_size=1024):
+        self.plants = plants
+        self.states = states
+        self.store = store
+        self.species = plants['Species'].tolist()  # Names decoded once
+        self.names = {col: states[col].tolist() for col in RESULT_COLS[:5]}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.state_answer = lru_cache(maxsize=cache_size)(self._state_answer)
+        self.crop_answer = lru_cache(maxsize=cache_size)(self._crop_answer)
+
+    def _state_scores(self, i):
+        '''
+        This function returns the crops x scores array of the state in row i.
+        '''
+
+        if self.store is not None:
+            return np.asarray(self.store.tensor[:, i]).T
+        scores = factor_scores(self.plants, self.states[i:i + 1])
+
+        return np.stack([scores[f][0] for f in SCORES], axis=-1)
+
+    def _crop_scores(self, j):
+        '''
+        This function returns the states x scores array of the plant in row j.
+        '''
+
+        if self.store is not None:
+            return np.asarray(self.store.tensor[:, :, j]).T
+        scores = factor_scores(self.plants[j:j + 1], self.states)
+
+        return np.stack([scores[f][:, 0] for f in SCORES], axis=-1)
+
+    def _state_answer(self, code, min_growth=1):
+        '''
+        This function returns the answer for one state code as a json string.
+        '''
+
+        i = self.states.index[code]
+        scores = self._state_scores(i)
+        keep = np.flatnonzero(scores[:, -1] >= min_growth)
+        answer = {col: self.names[col][i] for col in RESULT_COLS[:5]}
+        answer['Crops'] = [dict(Species=self.species[j], **dict(zip(SCORES, scores[j].tolist()))) for j in keep]
+
+        return json.dumps(answer)
+
+    def _crop_answer(self, species, min_growth=1):
+        '''
+        This function returns the answer for one species as a json string.
+        '''
+
+        j = self.plants.index[species]
+        scores = self._crop_scores(j)
+        keep = np.flatnonzero(scores[:, -1] >= min_growth)
+        answer = {'Species': species,
+                  'States': [dict({col: self.names[col][i] for col in RESULT_COLS[:5]},
+                                  **dict(zip(SCORES, scores[i].tolist()))) for i in keep]}
+
+        return json.dumps(answer)
+
+    def count_request(self):
+        '''
+        This function adds one to the request count.
+        '''
+
+        with self._lock:
+            self.requests += 1
+
+    def metrics(self):
+        '''
+        This function returns the cache and request counts.
+        '''
+
+        metrics = {'requests': self.requests}
+        for name, cache in [('state', self.state_answer), ('crop', self.crop_answer)]:
+            info = cache.cache_info()
+            metrics[name + '_cache'] = {'hits': info.hits, 'misses': info.misses, 'size': info.currsize,
+                                        'max_size': info.maxsize}
+
+        return metrics
+
+
+def make_handler(service):
+    '''
+    This function returns the request handler class for a scoring service.
+    '''
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _send(self, status, body):
+            data = body.encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self, status, message):
+            self._send(status, json.dumps({'error': message}))
+
+        def do_GET(self):
+            service.count_request()
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/', 1)
+            try:
+                min_growth = int(parse_qs(url.query).get('min_growth', ['1'])[0])
+            except ValueError:
+                return self._error(400, 'min_growth must be an integer')
+
+            if parts == ['metrics']:
+                return self._send(200, json.dumps(service.metrics()))
+            if len(parts) != 2 or parts[0] not in ('state', 'crop'):
+                return self._error(404, 'unknown path {}'.format(url.path))
+
+            name = unquote(parts[1])
+            if parts[0] == 'state':
+                if name not in service.states.index:
+                    return self._error(404, 'unknown state code {}'.format(name))
+                return self._send(200, service.state_answer(name, min_growth))
+            if name not in service.plants.index:
+                return self._error(404, 'unknown species {}'.format(name))
+            return self._send(200, service.crop_answer(name, min_growth))
+
+        def do_POST(self):
+            service.count_request()
+            path = urlparse(self.path).path.strip('/')
+            if path not in ('states', 'crops'):
+                return self._error(404, 'unknown path /{}'.format(path))
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                names = body['codes' if path == 'states' else 'species']
+                min_growth = int(body.get('min_growth', 1))
+                if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+                    raise TypeError
+            except (ValueError, KeyError, TypeError, AttributeError):
+                return self._error(400, 'expected a json body with a list of {}'.format(
+                    'codes' if path == 'states' else 'species'))
+
+            index, answer = ((service.states.index, service.state_answer) if path == 'states' else
+                             (service.plants.index, service.crop_answer))
+            unknown = [name for name in names if name not in index]
+            if unknown:
+                return self._error(404, 'unknown names: {}'.format(', '.join(map(str, unknown))))
+            return self._send(200, '[' + ','.join(answer(name, min_growth) for name in names) + ']')
+
+        def log_message(self, format, *args):  # Keep the terminal quiet
+            pass
+
+    return Handler
+
+
+def load_service(cache_size=1024, use_store=True):
+    '''
+    This function loads the tables, and the score store if it has been built for the same plants and states, and
+    returns the scoring service.
+    '''
+
+    plants = CropTable.read('ecocrop_files/ecocrop_cleaned.csv')
+    states = StateTable.read('processed_env_files/env_var.csv')
+
+    # Store only if it holds the current scores of both csv files, otherwise score on request
+    store = open_store('ecocrop_files/ecocrop_cleaned.csv', 'processed_env_files/env_var.csv') if use_store else None
+
+    return ScoringService(plants, states, store, cache_size)
+
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Serve crop selector scores as json on localhost.')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on')
+    parser.add_argument('--cache-size', type=int, default=1024, help='answers kept in each cache')
+    parser.add_argument('--no-store', action='store_true', help='score on request even if the store is built')
+    args = parser.parse_args()
+
+    service = load_service(args.cache_size, not args.no_store)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(service))
+    print('Serving on http://127.0.0.1:{} ({})'.format(args.port, 'score store' if service.store is not None
+                                                       else 'scoring on request'))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
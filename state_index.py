@@ -0,0 +1,246 @@
+#!/bin/env python
+"""
+Program: State Box Index
+Programmer: Steven Doyle
+Date: 05.14.2021
+
+This script builds an index over the environmental attributes of the states so that the states where a plant can be
+grown can be found without running the cultivation function against every state. The states are split by texture
+and fertility class, and the states in each class are stored in a k-d tree over altitude, rainfall, pH, minimum and
+maximum temperature, and growing period. The absolute boundaries of a plant form a box in these attributes, so the
+states where it can be grown are the states inside the box of each allowed class. A missing state attribute fails no
+check in the cultivation function, except for the growing period, so states are also split by which attributes they
+are missing and their trees leave those attributes out, while states missing a growing period are left out of the
+index.
+
+inputs: 'ecocrop_cleaned.csv', 'env_var.csv'
+outputs: none, prints the number of states where each plant can be grown
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from cultivation_function import FERTILITY_LEVELS, MISSING_FAILS, TEXTURE_BITS, plant_codes
+
+
+# Numeric state attributes of the tree
+DIMS = ['Alt', 'Rain', 'pH', 'Temp_Min', 'Temp_Max', 'Cycle']
+
+# Plant boundary columns giving the low and high side of the box in each attribute, None for an open side
+BOX = [(None, 'Alt_Abs_Max'),
+       ('Rain_Abs_Min', 'Rain_Abs_Max'),
+       ('pH_Abs_Min', 'pH_Abs_Max'),
+       ('Temp_Abs_Min', None),
+       (None, 'Temp_Abs_Max'),
+       ('Cycle_Min', 'Cycle_Max')]
+
+# Largest number of states in a leaf of the tree
+LEAF_SIZE = 16
+
+
+class KDTree:
+    '''
+    This class is a static k-d tree over a set of points. Each node covers a contiguous run of the permuted point
+    order and stores the bounding box of its points, so a box query can take whole nodes that are inside the box
+    and skip nodes that are outside it.
+    '''
+
+    def __init__(self, points, leaf_size=LEAF_SIZE):
+        self.points = points
+        self.perm = np.arange(len(points))
+        self.lo, self.hi, self.start, self.end, self.children = [], [], [], [], []
+        if len(points):
+            self._build(0, len(points), leaf_size)
+        self.lo, self.hi = np.array(self.lo), np.array(self.hi)
+
+    def _build(self, start, end, leaf_size):
+        '''
+        This function adds the node covering perm[start:end], splitting it at the median of its widest attribute
+        until the leaves hold at most leaf_size points. It returns the node number.
+        '''
+
+        node = len(self.start)
+        pts = self.points[self.perm[start:end]]
+        self.lo.append(pts.min(axis=0))
+        self.hi.append(pts.max(axis=0))
+        self.start.append(start)
+        self.end.append(end)
+        self.children.append(None)
+
+        if end - start > leaf_size and pts.shape[1]:
+            dim = np.argmax(self.hi[node] - self.lo[node])  # Split the widest attribute
+            order = np.argsort(pts[:, dim], kind='stable')
+            self.perm[start:end] = self.perm[start:end][order]
+            mid = (start + end) // 2
+            self.children[node] = (self._build(start, mid, leaf_size), self._build(mid, end, leaf_size))
+
+        return node
+
+    def query(self, low, high):
+        '''
+        This function returns the positions of the points inside the closed box [low, high].
+        '''
+
+        if not self.start:
+            return np.array([], dtype=int)
+
+        found = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if (self.lo[node] > high).any() or (self.hi[node] < low).any():  # Box and node do not overlap
+                continue
+            ids = self.perm[self.start[node]:self.end[node]]
+            if (self.lo[node] >= low).all() and (self.hi[node] <= high).all():  # Node is inside the box
+                found.append(ids)
+            elif self.children[node] is None:  # Leaf on the edge of the box, check its points
+                pts = self.points[ids]
+                found.append(ids[((pts >= low) & (pts <= high)).all(axis=1)])
+            else:
+                stack.extend(self.children[node])
+
+        return np.sort(np.concatenate(found)) if found else np.array([], dtype=int)
+
+    def query_many(self, lows, highs):
+        '''
+        This function answers query() for many boxes at once, given as (boxes x attributes) arrays. The tree is
+        walked once, carrying along the boxes that overlap each node, and the result is a boxes x points boolean
+        array.
+        '''
+
+        inside = np.zeros((len(lows), len(self.points)), dtype=bool)
+        if not self.start:
+            return inside
+
+        stack = [(0, np.arange(len(lows)))]
+        while stack:
+            node, boxes = stack.pop()
+            low, high = lows[boxes], highs[boxes]
+            overlap = ~((self.lo[node] > high).any(axis=1) | (self.hi[node] < low).any(axis=1))
+            boxes, low, high = boxes[overlap], low[overlap], high[overlap]
+            if len(boxes) == 0:
+                continue
+
+            ids = self.perm[self.start[node]:self.end[node]]
+            contains = (self.lo[node] >= low).all(axis=1) & (self.hi[node] <= high).all(axis=1)
+            inside[np.ix_(boxes[contains], ids)] = True  # Nodes inside the box
+            boxes, low, high = boxes[~contains], low[~contains], high[~contains]
+            if len(boxes) == 0:
+                continue
+
+            if self.children[node] is None:  # Leaf on the edge of the boxes, check its points
+                pts = self.points[ids]
+                inside[np.ix_(boxes, ids)] = ((pts >= low[:, None]) & (pts <= high[:, None])).all(axis=2)
+            else:
+                stack.extend((child, boxes) for child in self.children[node])
+
+        return inside
+
+
+class StateBoxIndex:
+    '''
+    This class holds one k-d tree for each texture and fertility class of the state dataframe and each set of
+    missing attributes, built over the attributes that are present. States missing an attribute of MISSING_FAILS
+    can grow no plant and are left out.
+    '''
+
+    def __init__(self, states):
+        self.states = states
+        points = states[DIMS].to_numpy(dtype=float)
+        present = ~np.isnan(points)
+        grown = present[:, [DIMS.index(col) for col in MISSING_FAILS]].all(axis=1)
+
+        self.trees = {}  # (texture, fertility, attributes present) -> (state positions, attribute columns, tree)
+        classes = states.groupby(['Texture', 'Fertility'], sort=False).indices
+        for (texture, fertility), ids in classes.items():
+            ids = ids[grown[ids]]
+            for dims in np.unique(present[ids], axis=0):
+                kept = ids[(present[ids] == dims).all(axis=1)]
+                dims = np.flatnonzero(dims)
+                self.trees[(texture, fertility, tuple(dims))] = (kept, dims, KDTree(points[np.ix_(kept, dims)]))
+
+    def _boxes(self, plants):
+        '''
+        This function returns the low and high sides of the absolute boundary boxes of the plants, with missing or
+        open sides left unbounded.
+        '''
+
+        low = np.column_stack([np.full(len(plants), -np.inf) if col is None else plants[col].to_numpy(dtype=float)
+                               for col, _ in BOX])
+        high = np.column_stack([np.full(len(plants), np.inf) if col is None else plants[col].to_numpy(dtype=float)
+                                for _, col in BOX])
+        low[np.isnan(low)] = -np.inf
+        high[np.isnan(high)] = np.inf
+
+        return low, high
+
+    def _allowed(self, plants, key):
+        '''
+        This function returns which plants accept the texture and fertility class of one tree.
+        '''
+
+        texture, fertility = key[:2]
+        text_abs, _, fert_abs, _ = plant_codes(plants)
+
+        return ((text_abs & TEXTURE_BITS.get(texture, 0)) != 0) & (fert_abs <= FERTILITY_LEVELS[fertility])
+
+    def query(self, plantrow):
+        '''
+        This function takes a plant row and returns the sorted positions of the states inside its absolute
+        boundaries, which are the states where it has a growth score above 0.
+        '''
+
+        plant = plantrow.to_frame().T
+        low, high = self._boxes(plant)
+
+        # Only search the texture and fertility classes the plant accepts
+        found = [ids[tree.query(low[0, dims], high[0, dims])] for key, (ids, dims, tree) in self.trees.items()
+                 if self._allowed(plant, key)[0]]
+
+        return np.sort(np.concatenate(found)) if found else np.array([], dtype=int)
+
+    def query_matrix(self, plants):
+        '''
+        This function answers query() for every plant in the plant dataframe at once and returns a plants x states
+        boolean array of the states inside each plant's absolute boundaries.
+        '''
+
+        low, high = self._boxes(plants)
+        inside = np.zeros((len(plants), len(self.states)), dtype=bool)
+        for key, (ids, dims, tree) in self.trees.items():
+            allowed = np.flatnonzero(self._allowed(plants, key))  # Plants that accept this class
+            inside[np.ix_(allowed, ids)] = tree.query_many(low[np.ix_(allowed, dims)], high[np.ix_(allowed, dims)])
+
+        return inside
+
+    def query_all(self, plants):
+        '''
+        This function answers query() for every plant in the plant dataframe and returns a dictionary of state
+        position arrays keyed by species.
+        '''
+
+        inside = self.query_matrix(plants)
+
+        return {name: np.flatnonzero(row) for name, row in zip(plants['Species'], inside)}
+
+    def states_for(self, plantrow):
+        '''
+        This function returns the state rows where the plant can be grown.
+        '''
+
+        return self.states.iloc[self.query(plantrow)]
+
+
+
+if __name__ == '__main__':
+
+    # Initialize dataframes
+    plants = pd.read_csv('ecocrop_files/ecocrop_cleaned.csv', header=0)
+    states = pd.read_csv('processed_env_files/env_var.csv', header=0)
+
+    # Count the states where each plant can be grown
+    index = StateBoxIndex(states)
+    results = index.query_all(plants)
+    counts = pd.Series({name: len(ids) for name, ids in results.items()}, name='States')
+    print(counts.sort_values(ascending=False).to_string())
@@ -0,0 +1,228 @@
+#!/bin/env python
+"""
+Program: State Statistics
+Programmer: Steven Doyle
+Date: 05.25.2021
+
+This script summarizes the grid points of each checked join file by subnational jurisdiction in a single pass over the
+file. Besides the average written by 'env_data_conversions.py', it keeps the number of points, the variance, the
+minimum and maximum, and approximate percentiles of each jurisdiction's values. The file is read in chunks, and each
+jurisdiction only keeps running totals for the count, mean and variance and a bounded list of weighted centroids for
+the percentiles, so files larger than memory can be summarized. The wet season temperature percentiles can be used by
+'env_variables_construction.py' in place of the average for the minimum and maximum temperatures.
+
+inputs: 'checked_*_join.csv'
+outputs: 'stats_*.csv'
+
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+# Columns describing each jurisdiction, taken from its first row
+META_COLS = ['GID_0', 'NAME_0', 'GID_1', 'NAME_1', 'ENGTYPE_1']
+
+# Percentiles reported for each jurisdiction
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def quantile_name(q):
+    '''
+    This function returns the column name of a percentile, e.g. 'p05' for 0.05.
+    '''
+
+    return 'p{:02d}'.format(int(round(q*100)))
+
+
+class StreamingStats:
+    '''
+    This class keeps running statistics of values grouped by a key, updated one chunk at a time. The count, mean and
+    variance are combined chunk by chunk with the parallel form of Welford's method, and the minimum and maximum are
+    kept directly. Percentiles are estimated from a t-digest: each key keeps a sorted list of weighted centroids that
+    is merged with every new chunk and compressed again, with small centroids near the tails and larger ones in the
+    middle. The compression sets roughly how many centroids each key keeps.
+    '''
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.keys = pd.Index([])
+        self.meta = []
+        self.count = np.zeros(0)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+        self._group = np.zeros(0, dtype=np.int64)
+        self._centroid = np.zeros(0)
+        self._weight = np.zeros(0)
+
+    def _positions(self, keys, meta=None):
+        '''
+        This function returns the position of each key, adding keys that have not been seen yet with their
+        describing columns.
+        '''
+
+        pos = self.keys.get_indexer(keys)
+        if (pos < 0).any():
+            new = pd.unique(keys[pos < 0])
+            self.keys = self.keys.append(pd.Index(new)).rename(keys.name)
+            if meta is not None:
+                self.meta.append(meta[keys.isin(new)].drop_duplicates(keys.name))
+            grow = np.zeros(len(new))
+            self.count = np.concatenate([self.count, grow])
+            self.mean = np.concatenate([self.mean, grow])
+            self.m2 = np.concatenate([self.m2, grow])
+            self.min = np.concatenate([self.min, grow + np.inf])
+            self.max = np.concatenate([self.max, grow - np.inf])
+            pos = self.keys.get_indexer(keys)
+
+        return pos
+
+    def update(self, keys, values, meta=None):
+        '''
+        This function adds a chunk of values with their keys, given as pandas series. Missing values are skipped.
+        Rows of the meta dataframe describe the keys and the first one seen for each key is kept.
+        '''
+
+        pos = self._positions(keys, meta)
+        values = np.asarray(values, dtype=float)
+        valid = ~np.isnan(values)
+        pos, values = pos[valid], values[valid]
+        if len(values) == 0:
+            return
+
+        # Count, mean and sum of squared deviations of the chunk, combined with the running values
+        n = len(self.keys)
+        n_b = np.bincount(pos, minlength=n).astype(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_b = np.where(n_b > 0, np.bincount(pos, values, minlength=n)/n_b, 0)
+        m2_b = np.bincount(pos, (values - mean_b[pos])**2, minlength=n)
+        total = self.count + n_b
+        delta = mean_b - self.mean
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.mean = np.where(total > 0, self.mean + delta*n_b/total, 0)
+            self.m2 = np.where(total > 0, self.m2 + m2_b + delta**2*self.count*n_b/total, 0)
+        self.count = total
+        np.fmin.at(self.min, pos, values)
+        np.fmax.at(self.max, pos, values)
+
+        self._compress(np.concatenate([self._group, pos]), np.concatenate([self._centroid, values]),
+                       np.concatenate([self._weight, np.ones(len(values))]))
+
+    def _compress(self, group, centroid, weight):
+        '''
+        This function merges new points into the centroids of every key at once. The points of each key are sorted
+        and placed on the scale k(q) = compression*(asin(2q - 1)/pi + 1/2) by the share q of the key's weight below
+        their middle, and neighbouring points that fall in the same unit of the scale become one centroid.
+        '''
+
+        order = np.lexsort((centroid, group))
+        group, centroid, weight = group[order], centroid[order], weight[order]
+
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        sizes = np.diff(np.r_[starts, len(group)])
+        cum = np.cumsum(weight)
+        before = np.repeat(cum[starts] - weight[starts], sizes)
+        q = (cum - before - weight/2)/np.repeat(np.add.reduceat(weight, starts), sizes)
+        k = np.floor(self.compression*(np.arcsin(np.clip(2*q - 1, -1, 1))/np.pi + 0.5))
+
+        first = np.flatnonzero(np.r_[True, (group[1:] != group[:-1]) | (k[1:] != k[:-1])])
+        self._weight = np.add.reduceat(weight, first)
+        self._centroid = np.add.reduceat(centroid*weight, first)/self._weight
+        self._group = group[first]
+
+    def quantiles(self, qs=QUANTILES):
+        '''
+        This function estimates the given percentiles of every key by interpolating between the centres of its
+        centroids, and between the outer centroids and the minimum and maximum. It returns a keys x percentiles
+        array, with missing values for keys without values.
+        '''
+
+        result = np.full((len(self.keys), len(qs)), np.nan)
+        ids = np.flatnonzero(self.count > 0)
+        if len(ids) == 0:
+            return result
+
+        first = np.searchsorted(self._group, ids, 'left')
+        last = np.searchsorted(self._group, ids, 'right') - 1
+        cum = np.cumsum(self._weight)
+        centre = cum - self._weight/2
+        offset = cum[first] - self._weight[first]  # Weight of all keys before this one
+        lo_val, hi_val = self.min[ids], self.max[ids]
+
+        for j, q in enumerate(qs):
+            target = offset + 0.5 + q*(self.count[ids] - 1)  # Same as pandas when every centroid is one point
+            pos = np.searchsorted(centre, target)
+            hi = np.clip(pos, first, last)
+            lo = np.clip(pos - 1, first, last)
+            span = centre[hi] - centre[lo]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                frac = np.where(span > 0, (target - centre[lo])/span, 0)
+                value = self._centroid[lo] + frac*(self._centroid[hi] - self._centroid[lo])
+
+                # Between the minimum and the first centroid, and between the last centroid and the maximum
+                below = target < centre[first]
+                edge = (target - offset)/(centre[first] - offset)
+                value = np.where(below, lo_val + edge*(self._centroid[first] - lo_val), value)
+                end = offset + self.count[ids]
+                above = target > centre[last]
+                edge = (end - target)/(end - centre[last])
+                value = np.where(above, hi_val - edge*(hi_val - self._centroid[last]), value)
+
+            result[ids, j] = np.clip(value, lo_val, hi_val)
+
+        return result
+
+    def table(self, qs=QUANTILES):
+        '''
+        This function returns a dataframe with one row per key, in the order the keys were first seen, holding the
+        describing columns and the count, mean, variance, standard deviation, minimum, maximum and percentiles.
+        '''
+
+        has = self.count > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = np.where(self.count > 1, self.m2/(self.count - 1), np.nan)  # Sample variance like pandas
+        stats = pd.DataFrame({'count': self.count.astype(np.int64),
+                              'mean': np.where(has, self.mean, np.nan),
+                              'var': var,
+                              'std': np.sqrt(var),
+                              'min': np.where(has, self.min, np.nan),
+                              'max': np.where(has, self.max, np.nan)}, index=self.keys)
+        stats[[quantile_name(q) for q in qs]] = self.quantiles(qs)
+
+        if self.meta:
+            meta = pd.concat(self.meta).set_index(self.keys.name, drop=False)
+            stats = pd.concat([meta.reindex(self.keys), stats], axis=1)
+
+        return stats.reset_index(drop=True)
+
+
+def file_statistics(path, chunksize=100000, compression=100):
+    '''
+    This function reads a checked join file in chunks and returns the statistics table of its 'grid_code' values
+    for each subnational jurisdiction.
+    '''
+
+    stats = StreamingStats(compression)
+    for chunk in pd.read_csv(path, usecols=['grid_code'] + META_COLS, chunksize=chunksize):
+        stats.update(chunk['GID_1'], chunk['grid_code'], chunk[META_COLS])
+
+    return stats.table()
+
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Summarize the checked join files by subnational jurisdiction.')
+    parser.add_argument('files', nargs='*', default=['diurnal', 'dry_seasons', 'precip', 'el', 'growing_period',
+                                                     'wet_temp'], help='join files to summarize')
+    parser.add_argument('--chunksize', type=int, default=100000, help='rows read at a time')
+    parser.add_argument('--compression', type=int, default=100, help='centroids kept per jurisdiction')
+    args = parser.parse_args()
+
+    for name in args.files:
+        statdf = file_statistics('raw_env_var_csv/checked_{}_join.csv'.format(name), args.chunksize, args.compression)
+        statdf.to_csv('processed_env_files/stats_{}.csv'.format(name), header=True, index=False)
@@ -0,0 +1,101 @@
+#!/bin/env python
+"""
+Program: Table Cache
+Programmer: Steven Doyle
+Date: 05.21.2021
+
+This script keeps a binary copy of each csv table the project reads, so each csv only has to be parsed once. The
+copy is saved next to the csv in Feather format when pyarrow is installed, and as a pandas pickle otherwise, with the
+country and state code and name columns stored as categories. A table is read from its binary copy whenever the copy
+is newer than the csv, and the copy is rewritten whenever the csv changes.
+
+inputs: 'checked_*_join.csv', 'processed_*.csv', 'env_var.csv', 'ecocrop_cleaned.csv'
+outputs: '*.feather' or '*.pkl' next to each csv
+
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  Feather needs pyarrow
+    CACHE_EXT = '.feather'
+except ImportError:
+    CACHE_EXT = '.pkl'
+
+
+# Code and name columns stored as categories
+CATEGORICAL_COLS = ['GID_0', 'NAME_0', 'GID_1', 'NAME_1', 'ENGTYPE_1',
+                    'State_Code', 'State_Name', 'State_Type', 'Country_Code', 'Country_Name']
+
+# Tables cached when the script is run
+TABLES = ['raw_env_var_csv/checked_dry_seasons_join.csv', 'raw_env_var_csv/checked_growing_period_join.csv',
+          'raw_env_var_csv/checked_soils_join.csv', 'processed_env_files/processed_diurnal.csv',
+          'processed_env_files/processed_dry_seasons.csv', 'processed_env_files/processed_el.csv',
+          'processed_env_files/processed_growing_period.csv', 'processed_env_files/processed_precip.csv',
+          'processed_env_files/processed_soil.csv', 'processed_env_files/processed_wet_temp.csv',
+          'processed_env_files/env_var.csv', 'ecocrop_files/ecocrop_cleaned.csv']
+
+
+def cache_path(path):
+    '''
+    This function returns the path of the binary copy of a csv file.
+    '''
+
+    return os.path.splitext(path)[0] + CACHE_EXT
+
+
+def write_cache(df, path):
+    '''
+    This function saves the binary copy of a table read from the given csv path. The copy is written under a
+    temporary name in the same folder and then swapped in, so an interrupted or concurrent write never leaves a
+    partly written copy that is newer than the csv.
+    '''
+
+    cache = cache_path(path)
+    fd, tmp = tempfile.mkstemp(suffix=CACHE_EXT + '.tmp', dir=os.path.dirname(cache) or '.')
+    os.close(fd)
+    try:
+        if CACHE_EXT == '.feather':
+            df.reset_index(drop=True).to_feather(tmp)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, cache)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def read_table(path):
+    '''
+    This function reads a csv table, using its binary copy if it is newer than the csv. Otherwise the csv is parsed,
+    the code and name columns are converted to categories, and the binary copy is written. The table is returned with
+    a default index, so callers set their own index as they would after read_csv.
+    '''
+
+    cache = cache_path(path)
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+        if CACHE_EXT == '.feather':
+            return pd.read_feather(cache)
+        return pd.read_pickle(cache)
+
+    df = pd.read_csv(path, header=0)
+    for col in CATEGORICAL_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    write_cache(df, path)
+
+    return df
+
+
+
+if __name__ == '__main__':
+
+    # Refresh the binary copy of every table that has changed
+    for path in TABLES if len(sys.argv) == 1 else sys.argv[1:]:
+        if os.path.exists(path):
+            read_table(path)
+            print('{} cached as {}'.format(path, cache_path(path)))
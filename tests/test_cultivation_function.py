@@ -0,0 +1,66 @@
+"""
+Checks that the batch scoring in 'cultivation_function.py' gives the same scores as the cultivation() function it
+replaces, for every plant against a sample of states, with and without grouping equivalent states.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from crop_tables import CropTable, StateTable  # noqa: E402
+from cultivation_function import RESULT_COLS, SCORES, cultivation, cultivation_batch, suitability_matrix  # noqa: E402
+
+PLANT_FILE = os.path.join(ROOT, 'ecocrop_files', 'ecocrop_cleaned.csv')
+STATE_FILE = os.path.join(ROOT, 'processed_env_files', 'env_var.csv')
+
+# Morogoro and an even spread of the other states
+SAMPLE_CODES = ['TZA.14_1']
+SAMPLE_STEP = 300
+
+
+@pytest.fixture(scope='module')
+def plants():
+    return pd.read_csv(PLANT_FILE, header=0)
+
+
+@pytest.fixture(scope='module')
+def states():
+    return pd.read_csv(STATE_FILE, header=0)
+
+
+@pytest.fixture(scope='module')
+def sample(states):
+    rows = sorted(set(range(0, len(states), SAMPLE_STEP)) |
+                  set(np.flatnonzero(states['State_Code'].isin(SAMPLE_CODES))))
+    return states.iloc[rows].reset_index(drop=True)
+
+
+@pytest.fixture(scope='module')
+def expected(plants, sample):
+    rows = [cultivation(plantrow, staterow) for _, staterow in sample.iterrows() for _, plantrow in plants.iterrows()]
+    return pd.DataFrame(rows, columns=RESULT_COLS)
+
+
+def test_batch_matches_cultivation(plants, sample, expected):
+    resdf = cultivation_batch(plants, sample)
+    pd.testing.assert_frame_equal(resdf, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('dedupe', [False, True])
+def test_matrix_matches_cultivation(plants, sample, expected, dedupe):
+    matrix = suitability_matrix(plants, sample, workers=1, dedupe=dedupe)
+    scores = expected[SCORES].to_numpy().reshape(len(sample), len(plants), len(SCORES))
+    np.testing.assert_array_equal(matrix, scores.transpose(2, 0, 1))
+
+
+def test_dedupe_matches_every_state(plants, states):
+    plain = suitability_matrix(plants, states, workers=1)
+    np.testing.assert_array_equal(suitability_matrix(plants, states, workers=1, dedupe=True), plain)
+    tables = suitability_matrix(CropTable.from_frame(plants), StateTable.from_frame(states), workers=1, dedupe=True)
+    np.testing.assert_array_equal(tables, plain)
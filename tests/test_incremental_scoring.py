@@ -0,0 +1,79 @@
+"""
+Checks that 'incremental_scoring.py' keeps the store and its growth count roll-ups equal to a fresh scoring, including
+after the store has been rebuilt by 'score_store.py' in between.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cultivation_function import suitability_matrix  # noqa: E402
+from incremental_scoring import GROWTH, class_counts, full_build, update_store  # noqa: E402
+from score_store import ScoreStore, create_store, row_hashes, save_store  # noqa: E402
+
+PLANT_FILE = os.path.join(ROOT, 'ecocrop_files', 'ecocrop_cleaned.csv')
+STATE_FILE = os.path.join(ROOT, 'processed_env_files', 'env_var.csv')
+
+
+@pytest.fixture
+def tables():
+    plants = pd.read_csv(PLANT_FILE, header=0).iloc[:40].reset_index(drop=True)
+    states = pd.read_csv(STATE_FILE, header=0).iloc[:30].reset_index(drop=True)
+    return plants, states
+
+
+def build_store(plants, states, path):
+    '''
+    This function builds the store the way 'score_store.py' does.
+    '''
+
+    tensor = create_store(path, plants['Species'], states)
+    suitability_matrix(plants, states, out=tensor, workers=1)
+    tensor.flush()
+    del tensor
+    save_store(path, plants['Species'], states, hashes=(row_hashes(plants), row_hashes(states)))
+
+
+def assert_current(plants, states, path):
+    store = ScoreStore(path)
+    np.testing.assert_array_equal(store.tensor, suitability_matrix(plants, states, workers=1))
+    assert store.matches(plants, states)
+    with np.load(path + '.rollups.npz') as rollups:
+        np.testing.assert_array_equal(rollups['states'], class_counts(store.tensor[GROWTH], 1))
+        np.testing.assert_array_equal(rollups['species'], class_counts(store.tensor[GROWTH], 0))
+
+
+def test_update_after_store_rebuild(tables, tmp_path):
+    plants, states = tables
+    path = str(tmp_path / 'store')
+    full_build(plants, states, path)
+
+    # Edit a state, rebuild with score_store.py, then edit a plant and update
+    states.loc[3, 'Alt'] = states.loc[3, 'Alt'] + 2000
+    build_store(plants, states, path)
+    plants.loc[5, 'Alt_Abs_Max'] = 0
+    delta = update_store(plants, states, path)
+
+    assert delta['changed_species'] == [plants.loc[5, 'Species']]
+    assert delta['changed_states'] == []
+    assert_current(plants, states, path)
+
+
+def test_update_changed_rows(tables, tmp_path):
+    plants, states = tables
+    path = str(tmp_path / 'store')
+    full_build(plants, states, path)
+
+    states.loc[7, 'Alt'] = states.loc[7, 'Alt'] + 2000
+    plants.loc[2, 'Rain_Abs_Min'] = 0
+    delta = update_store(plants, states, path)
+
+    assert delta['changed_states'] == [states.loc[7, 'State_Code']]
+    assert delta['changed_species'] == [plants.loc[2, 'Species']]
+    assert_current(plants, states, path)
@@ -0,0 +1,50 @@
+"""
+Checks that the score store is only opened once it holds the finished scores of the current csv files.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cultivation_function import suitability_matrix  # noqa: E402
+from score_store import create_store, open_store, row_hashes, save_store  # noqa: E402
+
+PLANT_FILE = os.path.join(ROOT, 'ecocrop_files', 'ecocrop_cleaned.csv')
+STATE_FILE = os.path.join(ROOT, 'processed_env_files', 'env_var.csv')
+
+
+@pytest.fixture
+def files(tmp_path):
+    plants = pd.read_csv(PLANT_FILE, header=0).iloc[:20]
+    states = pd.read_csv(STATE_FILE, header=0).iloc[:30]
+    plants.to_csv(tmp_path / 'plants.csv', index=False)
+    states.to_csv(tmp_path / 'states.csv', index=False)
+    plants = pd.read_csv(tmp_path / 'plants.csv', header=0)
+    states = pd.read_csv(tmp_path / 'states.csv', header=0)
+    return plants, states, str(tmp_path / 'plants.csv'), str(tmp_path / 'states.csv'), str(tmp_path / 'store')
+
+
+def test_unfinished_store_is_not_opened(files):
+    plants, states, plant_file, state_file, path = files
+    tensor = create_store(path, plants['Species'], states)
+    del tensor
+    assert open_store(plant_file, state_file, path) is None
+
+
+def test_saved_store_is_opened(files):
+    plants, states, plant_file, state_file, path = files
+    tensor = create_store(path, plants['Species'], states)
+    suitability_matrix(plants, states, out=tensor, workers=1)
+    tensor.flush()
+    del tensor
+    save_store(path, plants['Species'], states, hashes=(row_hashes(plants), row_hashes(states)))
+
+    store = open_store(plant_file, state_file, path)
+    assert store is not None
+    np.testing.assert_array_equal(store.tensor, suitability_matrix(plants, states, workers=1))